@@ -3,14 +3,44 @@ try:
 except ImportError:
     __version__ = '0+unknown'
 
-from .config import clear_user_id, print_config, setup
-from .tracker import track, track_exit
-from .api import add_breadcrumb, check_project, get_usage
+# Public functions are loaded on first access, so `import migas` stays cheap
+_lazy_attrs = {
+    'add_breadcrumb': 'api',
+    'check_project': 'api',
+    'check_project_many': 'api',
+    'clear_user_id': 'config',
+    'get_usage': 'api',
+    'print_config': 'config',
+    'setup': 'config',
+    'track': 'tracker',
+    'track_exit': 'tracker',
+}
+_submodules = {
+    'aio',
+    'api',
+    'batch',
+    'breaker',
+    'cache',
+    'config',
+    'error',
+    'heartbeat',
+    'ratelimit',
+    'registry',
+    'relay',
+    'request',
+    'rollup',
+    'spans',
+    'spool',
+    'testing',
+    'tracker',
+    'utils',
+}
 
 __all__ = (
     '__version__',
     'add_breadcrumb',
     'check_project',
+    'check_project_many',
     'clear_user_id',
     'get_usage',
     'print_config',
@@ -18,3 +48,19 @@ __all__ = (
     'track',
     'track_exit',
 )
+
+
+def __getattr__(name: str):
+    from importlib import import_module
+
+    if name in _lazy_attrs:
+        value = getattr(import_module(f'.{_lazy_attrs[name]}', __name__), name)
+        globals()[name] = value
+        return value
+    if name in _submodules:
+        return import_module(f'.{name}', __name__)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_lazy_attrs, *_submodules})
@@ -0,0 +1,366 @@
+"""
+Asynchronous API, for use within an :mod:`asyncio` event loop.
+
+These coroutines mirror :func:`migas.add_breadcrumb`, :func:`migas.check_project` and
+:func:`migas.get_usage`, but communicate with the server over non-blocking sockets. Connections
+are shared between concurrent calls made from the same event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import time
+import weakref
+from email.message import Message
+from http.client import parse_headers
+from urllib.parse import urlsplit
+
+from migas import breaker, rollup
+from migas.api.operations import CheckProject, GetUsage, _filter_response, _refreshing
+from migas.api.rest import Breadcrumb
+from migas.cache import lookup, store
+from migas.config import Config, logger, telemetry_enabled
+from migas.ratelimit import admit, not_admitted
+from migas.request import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_POOL_IDLE_TIMEOUT,
+    DEFAULT_TIMEOUT,
+    OVERSIZED_RESPONSE,
+    TIMEOUT_RESPONSE,
+    UNAVAIL_RESPONSE,
+    MigasResponse,
+    _check_compression,
+    _prepare_request,
+    _process_response,
+    _ResponseDecoder,
+    _ResponseTooLarge,
+    _ssl_context,
+)
+
+DEFAULT_MAX_CONNECTIONS = 8
+
+_Connection = tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+@telemetry_enabled
+async def add_breadcrumb(
+    project: str, project_version: str, wait: bool = False, **kwargs
+) -> dict | None:
+    """
+    Send a breadcrumb with usage information to the telemetry server.
+
+    Accepts the same arguments as :func:`migas.add_breadcrumb`. Unless `wait` is enabled, the
+    breadcrumb is sent from a background task - use :func:`flush` to wait for it.
+    """
+    payload = Breadcrumb.from_config(project, project_version, **kwargs).to_dict()
+    logger.debug(payload)
+    # the rollup may be sent along with the record, and rate limits are shared through a locked
+    # file - keep both off the event loop
+    if not wait and await asyncio.to_thread(rollup.record, Config.endpoint, payload):
+        return None
+    if not await asyncio.to_thread(admit, Config.endpoint, payload):
+        return not_admitted() if wait else None
+
+    coro = _request(Config.endpoint, path=Breadcrumb._route, json_data=payload, wait=wait)
+    if not wait:
+        _background(coro)
+        return None
+    res = await coro
+    logger.debug(res)
+    return _filter_response(res[1], 'add_breadcrumb')
+
+
+@telemetry_enabled
+async def check_project(project: str, project_version: str, **kwargs) -> dict:
+    """
+    Check a project version with the latest available.
+
+    Responses are cached as with :func:`migas.check_project`.
+
+    Returns
+    -------
+    response: dict
+        keys: success, flagged, latest, message
+    """
+    endpoint = f'{Config.endpoint.rstrip("/")}/graphql'
+    # the cache is shared through a locked file - keep it off the event loop
+    if cached := await asyncio.to_thread(lookup, endpoint, project, project_version):
+        res, fresh = cached
+        key = (endpoint, project, project_version)
+        if not fresh and key not in _refreshing:
+            _refreshing.add(key)
+            _background(_refresh_check_project(key, **kwargs))
+        return res
+    return await _check_project(endpoint, project, project_version, **kwargs)
+
+
+async def _check_project(endpoint: str, project: str, project_version: str, **kwargs) -> dict:
+    query, variables = CheckProject.generate_query(
+        project=project, project_version=project_version, **kwargs
+    )
+    logger.debug(query)
+    _, response = await _request(endpoint, query=query, variables=variables, wait=True)
+    logger.debug(response)
+    res = _filter_response(response, CheckProject.operation_name)
+    await asyncio.to_thread(store, endpoint, project, project_version, res)
+    return res
+
+
+async def _refresh_check_project(key: tuple[str, str, str], **kwargs) -> None:
+    try:
+        await _check_project(*key, **kwargs)
+    finally:
+        _refreshing.discard(key)
+
+
+@telemetry_enabled
+async def get_usage(project: str, start: str, **kwargs) -> dict:
+    """
+    Retrieve usage statistics from the migas server.
+
+    Accepts the same arguments as :func:`migas.get_usage`.
+
+    Returns
+        response : dict
+            success, hits, unique, message
+    """
+    query, variables = GetUsage.generate_query(project=project, start=start, **kwargs)
+    logger.debug(query)
+    endpoint = f'{Config.endpoint.rstrip("/")}/graphql'
+    _, response = await _request(endpoint, query=query, variables=variables, wait=True)
+    logger.debug(response)
+    return _filter_response(response, GetUsage.operation_name)
+
+
+# Keep references to background tasks, so they are not garbage collected while pending
+_tasks: set[asyncio.Task] = set()
+
+
+def _background(coro) -> None:
+    task = asyncio.get_running_loop().create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def flush() -> None:
+    """Wait for breadcrumbs sent in the background from the running event loop."""
+    loop = asyncio.get_running_loop()
+    while pending := [t for t in _tasks if t.get_loop() is loop]:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def aclose() -> None:
+    """Wait for background breadcrumbs, then close the connections of the running event loop."""
+    await flush()
+    await _pool.aclose()
+
+
+async def _request(
+    url: str,
+    *,
+    query: str | None = None,
+    variables: dict | None = None,
+    path: str | None = None,
+    json_data: dict | list | None = None,
+    timeout: float | None = None,
+    method: str = 'POST',
+    wait: bool = False,
+) -> MigasResponse:
+    res = await _send_request(
+        url,
+        query=query,
+        variables=variables,
+        path=path,
+        json_data=json_data,
+        timeout=timeout,
+        method=method,
+        wait=wait,
+    )
+    if json_data is not None and (res is TIMEOUT_RESPONSE or res is UNAVAIL_RESPONSE):
+        from migas.spool import spool_failed
+
+        await asyncio.to_thread(spool_failed, url, path, json_data)
+    return res
+
+
+async def _send_request(
+    url: str,
+    *,
+    query: str | None = None,
+    variables: dict | None = None,
+    path: str | None = None,
+    json_data: dict | list | None = None,
+    timeout: float | None = None,
+    method: str = 'POST',
+    wait: bool = False,
+) -> MigasResponse:
+    timeout = timeout or float(os.getenv('MIGAS_TIMEOUT', DEFAULT_TIMEOUT))
+    key, request_path, headers, body = _prepare_request(
+        url, query=query, variables=variables, path=path, json_data=json_data, wait=wait
+    )
+    headers['Host'] = key[1]
+    head = f'{method} {request_path} HTTP/1.1\r\n'
+    head += ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+    data = head.encode('latin-1') + b'\r\n' + (body or b'')
+
+    # the breaker state is shared through a locked file - keep it off the event loop
+    if not await asyncio.to_thread(breaker.allow, key):
+        return UNAVAIL_RESPONSE
+
+    async with _pool.limit(key):
+        # A pooled connection may have been closed by the server while idle - in that case,
+        # retry once on a fresh connection.
+        reuse = True
+        while True:
+            conn = None
+            reused = False
+            try:
+                conn, reused = await _pool.acquire(key, timeout, reuse=reuse)
+                conn[1].write(data)
+                status, resp_headers, content, will_close = await asyncio.wait_for(
+                    _read_response(conn[0]), timeout
+                )
+            except _ResponseTooLarge as e:
+                _close(conn)
+                logger.debug(e)
+                return OVERSIZED_RESPONSE
+            except (asyncio.TimeoutError, TimeoutError):
+                _close(conn)
+                await asyncio.to_thread(breaker.record, key, success=False)
+                return TIMEOUT_RESPONSE
+            except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                _close(conn)
+                if reused:
+                    reuse = False
+                    continue
+                await asyncio.to_thread(breaker.record, key, success=False)
+                return UNAVAIL_RESPONSE
+            except BaseException:
+                _close(conn)
+                raise
+            break
+
+        await asyncio.to_thread(breaker.record, key, success=True)
+
+        if will_close:
+            _close(conn)
+        else:
+            _pool.release(key, conn)
+
+    if _check_compression(key, status, headers, resp_headers):
+        return await _send_request(
+            url,
+            query=query,
+            variables=variables,
+            path=path,
+            json_data=json_data,
+            timeout=timeout,
+            method=method,
+            wait=wait,
+        )
+    return _process_response(status, resp_headers, content)
+
+
+async def _read_response(reader: asyncio.StreamReader) -> tuple[int, Message, bytearray, bool]:
+    """
+    Read a response, and return its status, headers, decoded body and if the connection will
+    close. The body is decompressed as it arrives.
+    """
+    head = await reader.readuntil(b'\r\n\r\n')
+    status_line, _, header_block = head.partition(b'\r\n')
+    version, status, *_ = status_line.decode('latin-1').split(None, 2)
+    headers = parse_headers(io.BytesIO(header_block))
+    will_close = version == 'HTTP/1.0' or headers.get('connection', '').lower() == 'close'
+    decoder = _ResponseDecoder(headers.get('content-encoding'))
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while size := int((await reader.readline()).split(b';')[0], 16):
+            decoder.feed(await reader.readexactly(size))
+            await reader.readexactly(2)
+        # skip trailers
+        while (await reader.readline()) not in (b'\r\n', b''):
+            pass
+    elif (length := headers.get('content-length')) is not None:
+        remaining = int(length)
+        decoder.check_length(remaining)
+        while remaining:
+            chunk = await reader.readexactly(min(remaining, DEFAULT_CHUNK_SIZE))
+            decoder.feed(chunk)
+            remaining -= len(chunk)
+    else:
+        while chunk := await reader.read(DEFAULT_CHUNK_SIZE):
+            decoder.feed(chunk)
+        will_close = True
+    return int(status), headers, decoder.finish(), will_close
+
+
+def _close(conn: _Connection | None) -> None:
+    if conn is not None:
+        conn[1].close()
+
+
+class _AsyncConnectionPool:
+    """
+    Idle HTTP/1.1 keep-alive connections, per event loop and (scheme, netloc).
+
+    At most ``MIGAS_AIO_MAX_CONNECTIONS`` connections are open to each endpoint at once, and all
+    of them may be kept for reuse for ``MIGAS_POOL_IDLE_TIMEOUT`` seconds.
+    """
+
+    def __init__(self):
+        self._idle = weakref.WeakKeyDictionary()
+        self._limits = weakref.WeakKeyDictionary()
+
+    def limit(self, key: tuple[str, str]) -> asyncio.Semaphore:
+        limits = self._limits.setdefault(asyncio.get_running_loop(), {})
+        if key not in limits:
+            size = int(os.getenv('MIGAS_AIO_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS))
+            limits[key] = asyncio.Semaphore(max(size, 1))
+        return limits[key]
+
+    async def acquire(
+        self, key: tuple[str, str], timeout: float, reuse: bool = True
+    ) -> tuple[_Connection, bool]:
+        """Return a connection for `key`, and whether it is a reused idle connection."""
+        if reuse:
+            idle_timeout = float(os.getenv('MIGAS_POOL_IDLE_TIMEOUT', DEFAULT_POOL_IDLE_TIMEOUT))
+            idle = self._idle.get(asyncio.get_running_loop(), {}).get(key, [])
+            now = time.monotonic()
+            while idle:
+                released, conn = idle.pop()
+                if now - released < idle_timeout and not conn[0].at_eof():
+                    return conn, True
+                _close(conn)
+
+        scheme, netloc = key
+        parts = urlsplit(f'//{netloc}')
+        https = scheme == 'https'
+        conn = await asyncio.wait_for(
+            asyncio.open_connection(
+                parts.hostname,
+                parts.port or (443 if https else 80),
+                ssl=_ssl_context() if https else None,
+            ),
+            timeout,
+        )
+        return conn, False
+
+    def release(self, key: tuple[str, str], conn: _Connection) -> None:
+        self._idle.setdefault(asyncio.get_running_loop(), {}).setdefault(key, []).append(
+            (time.monotonic(), conn)
+        )
+
+    async def aclose(self) -> None:
+        idle = self._idle.pop(asyncio.get_running_loop(), {})
+        for conns in idle.values():
+            for _, conn in conns:
+                conn[1].close()
+                try:
+                    await conn[1].wait_closed()
+                except (ConnectionError, OSError):
+                    pass
+
+
+_pool = _AsyncConnectionPool()
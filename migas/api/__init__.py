@@ -1,4 +1,4 @@
-from .operations import add_project, check_project, get_usage
+from .operations import add_project, check_project, check_project_many, get_usage
 from .rest import add_breadcrumb
 
-__all__ = ('add_breadcrumb', 'add_project', 'check_project', 'get_usage')
+__all__ = ('add_breadcrumb', 'add_project', 'check_project', 'check_project_many', 'get_usage')
@@ -23,27 +23,100 @@ ERROR = '[migas-py] An error occurred.'
 
 @dataclasses.dataclass
 class Operation:
+    """
+    A GraphQL operation on a single field.
+
+    `TEXT` arguments are sent as GraphQL variables, while `LITERAL` arguments (booleans and enum
+    values) are inlined. The query skeleton is compiled when a subclass is created, and a query
+    template is kept for each combination of arguments, so generating a query only substitutes
+    the literal values.
+    """
+
     operation_type: str
     operation_name: str
     query_args: dict
     selections: ty.Sequence[str] | None = None  # TODO: Add subfield selection support
+    # GraphQL types of TEXT arguments, if not `String`
+    variable_types: ty.ClassVar[dict] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._selection = _escape(f'{{{",".join(cls.selections)}}}') if cls.selections else ''
+        cls._text_args = frozenset(
+            arg for arg, qtype in cls.query_args.items() if qtype is QueryParamType.TEXT
+        )
+        cls._templates = {}
 
     @classmethod
-    def generate_query(cls, *args, **kwargs) -> str:
-        parameters = _introspec(cls.generate_query, locals())
-        params = {**kwargs, **parameters}
-        query = cls._construct_query(params)
-        return query
+    def generate_query(cls, **kwargs) -> tuple[str, dict]:
+        """Return the query and its variables. Arguments that are `None` are omitted."""
+        return cls._generate([kwargs])
 
     @classmethod
-    def _construct_query(cls, params: dict) -> str:
-        """Construct the graphql query."""
-        query_params = _parse_format_params(params, cls.query_args)
-        query = f'{cls.operation_type}{{{cls.operation_name}({query_params})'
-        if cls.selections:
-            query += f'{{{",".join(f for f in cls.selections)}}}'
-        query += '}'
-        return query
+    def generate_aliased_query(cls, params: ty.Sequence[dict]) -> tuple[str, dict]:
+        """
+        Return a query selecting the operation once for each mapping of arguments in `params`.
+
+        The selections are aliased ``p0``, ``p1``, ..., and their variables prefixed likewise.
+        """
+        return cls._generate(params, aliased=True)
+
+    @classmethod
+    def _generate(cls, params: ty.Sequence[dict], aliased: bool = False) -> tuple[str, dict]:
+        declarations = []
+        fields = []
+        values = {}
+        literals = {}
+        for i, kwargs in enumerate(params):
+            alias = f'p{i}' if aliased else ''
+            args = tuple(arg for arg in cls.query_args if kwargs.get(arg) is not None)
+            template = cls._templates.get((args, alias))
+            if template is None:
+                template = cls._templates[args, alias] = cls._compile(args, alias)
+            if template[0]:
+                declarations.append(template[0])
+            fields.append(template[1])
+
+            prefix = f'{alias}_' if alias else ''
+            for arg in args:
+                val = kwargs[arg]
+                if isinstance(val, bool):
+                    val = str(val).lower()
+                if arg in cls._text_args:
+                    # other values are JSON-encoded, as they were when inlined in the query
+                    values[prefix + arg] = val if isinstance(val, str) else json.dumps(val)
+                else:
+                    literals[prefix + arg] = val
+
+        head = f'{cls.operation_type} {cls.__name__}'
+        if declarations:
+            head += f'({",".join(declarations)})'
+        template = f'{head}{{{{{" ".join(fields)}}}}}'
+        return template.format_map(literals), values
+
+    @classmethod
+    def _compile(cls, args: tuple[str, ...], alias: str = '') -> tuple[str, str]:
+        """
+        Return the variable declarations and the field template for `args`, with placeholders
+        for literal arguments.
+        """
+        prefix = f'{alias}_' if alias else ''
+        declarations = ','.join(
+            f'${prefix}{arg}:{cls.variable_types.get(arg, "String")}!'
+            for arg in args
+            if arg in cls._text_args
+        )
+        inputs = ','.join(
+            f'{arg}:${prefix}{arg}' if arg in cls._text_args else f'{arg}:{{{prefix}{arg}}}'
+            for arg in args
+        )
+        field = f'{alias}:' if alias else ''
+        field += f'{cls.operation_name}({inputs}){cls._selection}'
+        return declarations, field
+
+
+def _escape(text: str) -> str:
+    return text.replace('{', '{{').replace('}', '}}')
 
 
 @telemetry_enabled
@@ -101,20 +174,135 @@ def check_project(project: str, project_version: str, **kwargs) -> dict:
     This can be used to check for the most recent version, as well as if
     the `project_version` has been flagged by developers.
 
+    Successful responses are cached on disk for ``MIGAS_CHECK_TTL`` seconds. Once expired, the
+    cached response is still returned while it is refreshed in the background.
+
     Returns
     -------
     response: dict
         keys: success, flagged, latest, message
     """
-    query = CheckProject.generate_query(project=project, project_version=project_version, **kwargs)
-    logger.debug(query)
+    from migas.cache import lookup
+
     endpoint = f'{Config.endpoint.rstrip("/")}/graphql'
-    _, response = request(endpoint, query=query, wait=True)
+    if cached := lookup(endpoint, project, project_version):
+        res, fresh = cached
+        if not fresh:
+            _refresh_check_project(endpoint, project, project_version, **kwargs)
+        return res
+    return _check_project(endpoint, project, project_version, **kwargs)
+
+
+def _check_project(endpoint: str, project: str, project_version: str, **kwargs) -> dict:
+    from migas.cache import store
+
+    query, variables = CheckProject.generate_query(
+        project=project, project_version=project_version, **kwargs
+    )
+    logger.debug(query)
+    _, response = request(endpoint, query=query, variables=variables, wait=True)
     logger.debug(response)
     res = _filter_response(response, CheckProject.operation_name)
+    store(endpoint, project, project_version, res)
     return res
 
 
+# Keys of the cached responses being refreshed
+_refreshing = set()
+
+
+def _refresh_check_project(endpoint: str, project: str, project_version: str, **kwargs) -> None:
+    """Refresh a cached response on the background sender, once at a time."""
+    from migas.request import _sender
+
+    key = (endpoint, project, project_version)
+    if key in _refreshing:
+        return
+    _refreshing.add(key)
+
+    def refresh():
+        try:
+            _check_project(endpoint, project, project_version, **kwargs)
+        finally:
+            _refreshing.discard(key)
+
+    if not _sender.submit(refresh):
+        _refreshing.discard(key)
+
+
+@telemetry_enabled
+def check_project_many(projects: ty.Sequence[tuple[str, str]], **kwargs) -> list[dict]:
+    """
+    Check several project versions with the latest available, in a single request.
+
+    `projects` is a sequence of (project, project_version) pairs, and `kwargs` are passed along
+    for every project. Responses are cached as with :func:`check_project`.
+
+    Returns
+    -------
+    responses: list of dict
+        one per project, with keys: success, flagged, latest, message
+    """
+    from migas.cache import lookup
+
+    endpoint = f'{Config.endpoint.rstrip("/")}/graphql'
+    results = [None] * len(projects)
+    missing = []
+    stale = []
+    for i, (project, project_version) in enumerate(projects):
+        if cached := lookup(endpoint, project, project_version):
+            results[i], fresh = cached
+            if not fresh and (endpoint, project, project_version) not in _refreshing:
+                stale.append((project, project_version))
+        else:
+            missing.append(i)
+
+    if stale:
+        _refresh_check_project_many(endpoint, stale, **kwargs)
+    if missing:
+        responses = _check_project_many(endpoint, [projects[i] for i in missing], **kwargs)
+        for i, res in zip(missing, responses, strict=True):
+            results[i] = res
+    return results
+
+
+def _check_project_many(
+    endpoint: str, projects: ty.Sequence[tuple[str, str]], **kwargs
+) -> list[dict]:
+    from migas.cache import store
+
+    query, variables = CheckProject.generate_aliased_query(
+        [{**kwargs, 'project': p, 'project_version': v} for p, v in projects]
+    )
+    logger.debug(query)
+    _, response = request(endpoint, query=query, variables=variables, wait=True)
+    logger.debug(response)
+    results = []
+    for i, (project, project_version) in enumerate(projects):
+        # a project that failed is null in an otherwise successful response
+        res = _filter_response(response, f'p{i}') or {'success': False, 'message': ERROR}
+        store(endpoint, project, project_version, res)
+        results.append(res)
+    return results
+
+
+def _refresh_check_project_many(endpoint: str, projects: list[tuple[str, str]], **kwargs) -> None:
+    """Refresh cached responses with a single request on the background sender."""
+    from migas.request import _sender
+
+    keys = {(endpoint, project, project_version) for project, project_version in projects}
+    _refreshing.update(keys)
+
+    def refresh():
+        try:
+            _check_project_many(endpoint, projects, **kwargs)
+        finally:
+            _refreshing.difference_update(keys)
+
+    if not _sender.submit(refresh):
+        _refreshing.difference_update(keys)
+
+
 class GetUsage(Operation):
     operation_type = 'query'
     operation_name = 'get_usage'
@@ -124,6 +312,7 @@ class GetUsage(Operation):
         'end': QueryParamType.TEXT,
         'unique': QueryParamType.LITERAL,
     }
+    variable_types = {'start': 'DateTime', 'end': 'DateTime'}
 
 
 @telemetry_enabled
@@ -147,27 +336,15 @@ def get_usage(project: str, start: str, **kwargs) -> dict:
         response : dict
             success, hits, unique, message
     """
-    query = GetUsage.generate_query(project=project, start=start, **kwargs)
+    query, variables = GetUsage.generate_query(project=project, start=start, **kwargs)
     logger.debug(query)
     endpoint = f'{Config.endpoint.rstrip("/")}/graphql'
-    _, response = request(endpoint, query=query, wait=True)
+    _, response = request(endpoint, query=query, variables=variables, wait=True)
     logger.debug(response)
     res = _filter_response(response, GetUsage.operation_name)
     return res
 
 
-def _introspec(func: ty.Callable, func_locals: dict) -> dict:
-    """Inspect a function and return all parameters (not defaults)."""
-    import inspect
-
-    sig = inspect.signature(func)
-    return {
-        param: func_locals[param]
-        for param, val in sig.parameters.items()
-        if func_locals[param] != val.default and param != 'kwargs'
-    }
-
-
 def _filter_response(response: dict | str, operation: str, fallback: dict | None = None):
     if not fallback:
         fallback = {'success': False, 'message': ERROR}
@@ -189,29 +366,3 @@ def _filter_response(response: dict | str, operation: str, fallback: dict | None
             fallback['message'] = response.get('detail')
     finally:
         return fallback
-
-
-def _parse_format_params(params: dict, query_args: dict) -> str:
-    query_inputs = []
-    vals = None
-
-    for qarg, qval in query_args.items():
-        if qarg in params:
-            val = params[qarg]
-            if isinstance(val, bool):
-                val = str(val).lower()
-
-            if qval.name == 'TEXT':
-                fval = json.dumps(val)
-            elif qval.name == 'LITERAL':
-                fval = val
-            else:
-                logger.error('Do not know how to handle type %s', qval.name)
-                fval = ''
-            query_inputs.append(f'{qarg}:{fval}')
-
-        elif isinstance(qval, dict):
-            vals = _parse_format_params(params, qval)
-            query_inputs.append(f'{qarg}:{{{vals}}}')
-
-    return ','.join(query_inputs)
@@ -2,8 +2,11 @@ from __future__ import annotations
 from dataclasses import asdict, dataclass
 from typing import Any
 
+from migas import rollup
 from migas.api.operations import _filter_response
+from migas.batch import get_batcher
 from migas.config import Config, logger, telemetry_enabled
+from migas.ratelimit import admit, not_admitted
 from migas.request import request
 
 
@@ -28,6 +31,7 @@ class Process:
 @dataclass
 class Breadcrumb:
     _route = '/api/breadcrumb'
+    _batch_route = '/api/breadcrumbs'
 
     project: str
     project_version: str
@@ -35,6 +39,7 @@ class Breadcrumb:
     language_version: str | None = None
     ctx: Context | None = None
     proc: Process | None = None
+    metrics: dict | None = None
 
     @classmethod
     def from_config(cls, project: str, project_version: str, **kwargs) -> Breadcrumb:
@@ -66,6 +71,7 @@ class Breadcrumb:
             # Only include nested objects if they have any data
             ctx=ctx if any(v is not None for v in asdict(ctx).values()) else None,
             proc=proc if any(v is not None for v in asdict(proc).values()) else None,
+            metrics=data.get('metrics'),
         )
 
     def to_dict(self) -> dict:
@@ -93,16 +99,26 @@ def add_breadcrumb(
     project_version : str
         Version string
     wait : bool, default=False
-        If enabled, wait for server response.
+        If enabled, wait for server response. Otherwise, the breadcrumb may be batched with
+        others if ``MIGAS_BATCH_SIZE`` is set.
     **kwargs
         Additional usage information to send. Includes:
         - `language`
         - `language_version`
         - `status`, `status_desc`, `error_type`, `error_desc`
         - `user_id`, `session_id`, `user_type`, `platform`, `container`, `is_ci`
+        - `metrics`: a dictionary of additional measurements (e.g. tracked worker processes)
     """
     payload = Breadcrumb.from_config(project, project_version, **kwargs).to_dict()
     logger.debug(payload)
+    if not wait and rollup.record(Config.endpoint, payload):
+        return
+    if not admit(Config.endpoint, payload):
+        return not_admitted() if wait else None
+
+    if not wait and (batcher := get_batcher()) is not None:
+        batcher.add(Config.endpoint, payload)
+        return
 
     res = request(Config.endpoint, path=Breadcrumb._route, json_data=payload, wait=wait)
     if wait:
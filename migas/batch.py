@@ -0,0 +1,220 @@
+"""Client-side batching of breadcrumbs"""
+
+from __future__ import annotations
+
+import atexit
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger('migas-py')
+
+DEFAULT_BATCH_AGE = 5
+DEFAULT_BATCH_QUEUE_SIZE = 1000
+# Breadcrumbs reporting how a process ended are never dropped in favor of start pings
+FINAL_STATUSES = frozenset('FCS')
+
+
+class BreadcrumbBatcher:
+    """
+    Collect breadcrumb payloads and send them as a single array to the batch route.
+
+    A batch is sent once it holds `size` breadcrumbs, or once its oldest breadcrumb is
+    `max_age` seconds old. The queue holds at most `maxsize` breadcrumbs - when it is full,
+    the oldest non-final breadcrumb (e.g. a start ping) is dropped. If the queue only holds
+    final breadcrumbs, the new breadcrumb is dropped instead.
+
+    Servers must opt in to the batch route. Without `batch_route`, the breadcrumbs of a batch are
+    sent one request each. Breadcrumbs that are not accepted are spooled (if enabled).
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_age: float = DEFAULT_BATCH_AGE,
+        maxsize: int = DEFAULT_BATCH_QUEUE_SIZE,
+        batch_route: bool = True,
+    ):
+        self.size = max(size, 1)
+        self.batch_route = batch_route
+        self.max_age = max_age
+        self.maxsize = max(maxsize, 1)
+        self.dropped = 0
+        self._atexit = False
+        self._init_state()
+
+    def _init_state(self) -> None:
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._seq = itertools.count()
+        self._final = deque()
+        self._other = deque()
+        self._thread = None
+
+    def __len__(self) -> int:
+        return len(self._final) + len(self._other)
+
+    def add(self, endpoint: str, payload: dict) -> bool:
+        """Queue a breadcrumb payload. Returns `False` if the payload was dropped."""
+        final = _status(payload) in FINAL_STATUSES
+        item = (next(self._seq), time.monotonic(), endpoint, payload)
+        with self._cond:
+            if len(self) >= self.maxsize:
+                self.dropped += 1
+                if not self._other:
+                    logger.debug('Breadcrumb batch is full, dropping breadcrumb')
+                    return False
+                self._other.popleft()
+                logger.debug('Breadcrumb batch is full, dropped oldest non-final breadcrumb')
+            (self._final if final else self._other).append(item)
+            self._ensure_started()
+            self._cond.notify()
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Send all queued breadcrumbs now.
+
+        With a `timeout`, start pings and final breadcrumbs are sent first, and batches that
+        cannot be sent in time are spooled instead, and `False` is returned.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._send_lock:
+            with self._cond:
+                items = self._drain(finals_first=deadline is not None)
+            return self._send(items, deadline)
+
+    def _drain(self, finals_first: bool = False) -> list:
+        if finals_first:
+            # start pings and heartbeats stay ahead of the final breadcrumbs that follow them
+            starts = [item for item in self._other if _status(item[3]) == 'R']
+            others = [item for item in self._other if _status(item[3]) != 'R']
+            items = [*starts, *sorted(self._final), *others]
+        else:
+            items = sorted((*self._final, *self._other))
+        self._final.clear()
+        self._other.clear()
+        return items
+
+    def _time_to_flush(self) -> float | None:
+        """Seconds until the queued breadcrumbs are due to be sent, or `None` if empty."""
+        if len(self) >= self.size:
+            return 0
+        oldest = min((q[0][1] for q in (self._final, self._other) if q), default=None)
+        if oldest is None:
+            return None
+        return max(oldest + self.max_age - time.monotonic(), 0)
+
+    def _send(self, items: list, deadline: float | None = None) -> bool:
+        from migas.api.rest import Breadcrumb
+        from migas.request import TIMEOUT_RESPONSE, UNAVAIL_RESPONSE, _request
+        from migas.spool import spool_failed
+
+        batches = {}
+        for _, _, endpoint, payload in items:
+            batches.setdefault(endpoint, []).append(payload)
+        # without the batch route, breadcrumbs are sent one by one (over the same connection)
+        size = self.size if self.batch_route else 1
+        sent = True
+        for endpoint, payloads in batches.items():
+            for i in range(0, len(payloads), size):
+                chunk = payloads[i : i + size]
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    spool_failed(endpoint, Breadcrumb._route, chunk)
+                    sent = False
+                    continue
+                if self.batch_route:
+                    path, json_data = Breadcrumb._batch_route, chunk
+                else:
+                    path, json_data = Breadcrumb._route, chunk[0]
+                res = _request(endpoint, path=path, json_data=json_data, timeout=timeout)
+                if 200 <= res[0] < 300 or res is TIMEOUT_RESPONSE or res is UNAVAIL_RESPONSE:
+                    # breadcrumbs that could not be delivered were already spooled
+                    continue
+                # rejected - breadcrumbs the server will never accept are dropped on replay
+                spool_failed(endpoint, Breadcrumb._route, chunk)
+                sent = False
+        return sent
+
+    def _ensure_started(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='migas-batcher', daemon=True)
+            self._thread.start()
+        if not self._atexit:
+            # The worker is a daemon thread - send anything left over on exit
+            atexit.register(self._flush_at_exit)
+            self._atexit = True
+
+    def _flush_at_exit(self) -> None:
+        from migas.tracker import _exit_timeout
+
+        # within the time budget shared by the final breadcrumbs
+        self.flush(timeout=_exit_timeout())
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while (timeout := self._time_to_flush()) != 0:
+                    self._cond.wait(timeout)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.debug('Failed to send breadcrumb batch: %s', e, exc_info=True)
+
+
+_batcher: BreadcrumbBatcher | None = None
+_batcher_lock = threading.Lock()
+
+
+def _batch_size() -> int:
+    return int(os.getenv('MIGAS_BATCH_SIZE') or 0)
+
+
+def _status(payload: dict) -> str | None:
+    return (payload.get('proc') or {}).get('status')
+
+
+def batching_enabled() -> bool:
+    """Whether breadcrumbs are batched - the server is then known to accept batches."""
+    return _batch_size() > 0
+
+
+def get_batcher() -> BreadcrumbBatcher | None:
+    """
+    Return the process-wide batcher, or `None` if batching is disabled.
+
+    Batching is enabled by setting ``MIGAS_BATCH_SIZE`` to a positive number of breadcrumbs,
+    once the server accepts batches.
+    ``MIGAS_BATCH_AGE`` (seconds) and ``MIGAS_BATCH_QUEUE_SIZE`` control the maximum age of a
+    batch and the maximum number of queued breadcrumbs.
+    """
+    global _batcher
+
+    if (size := _batch_size()) <= 0:
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = BreadcrumbBatcher(
+                    size,
+                    max_age=float(os.getenv('MIGAS_BATCH_AGE') or DEFAULT_BATCH_AGE),
+                    maxsize=int(os.getenv('MIGAS_BATCH_QUEUE_SIZE') or DEFAULT_BATCH_QUEUE_SIZE),
+                )
+    return _batcher
+
+
+def _reinit_after_fork() -> None:
+    global _batcher_lock
+
+    _batcher_lock = threading.Lock()
+    if _batcher is not None:
+        # breadcrumbs queued by the parent are the parent's to send
+        _batcher._init_state()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
@@ -0,0 +1,100 @@
+"""
+Circuit breaker for unreachable servers, shared between processes on the same host.
+
+After ``MIGAS_BREAKER_THRESHOLD`` consecutive connection failures to a server, calls to it fail
+immediately for ``MIGAS_BREAKER_COOLDOWN`` seconds. Once the cooldown has elapsed, a single call
+is let through to probe the server (half-open): if it succeeds, the breaker closes again,
+otherwise the cooldown starts over. The state of each server is kept in a small file in the
+runtime directory, which only exists while failures are being recorded.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from migas.utils import file_lock, get_runtime_dir
+
+logger = logging.getLogger('migas-py')
+
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN = 60
+
+
+def _state_file(key: tuple[str, str]) -> Path | None:
+    import zlib
+
+    if (runtime_dir := get_runtime_dir()) is None:
+        return None
+    scheme, netloc = key
+    return runtime_dir / 'breaker' / f'{scheme}-{zlib.crc32(netloc.encode()):08x}.json'
+
+
+def _read(state_file: Path) -> dict:
+    try:
+        state = json.loads(state_file.read_text())
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def _write(state_file: Path, state: dict) -> None:
+    tmp = state_file.with_name(f'{state_file.name}.{os.getpid()}')
+    try:
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, state_file)
+    except OSError as e:
+        tmp.unlink(missing_ok=True)
+        logger.debug('Could not update circuit breaker: %s', e)
+
+
+def _threshold() -> int:
+    return int(os.getenv('MIGAS_BREAKER_THRESHOLD', DEFAULT_BREAKER_THRESHOLD))
+
+
+def allow(key: tuple[str, str]) -> bool:
+    """Whether a call to the server at `key` (scheme, netloc) may be made."""
+    if (threshold := _threshold()) <= 0 or (state_file := _state_file(key)) is None:
+        return True
+    # healthy servers have no state, so this is usually a single failed open()
+    if _read(state_file).get('failures', 0) < threshold:
+        return True
+
+    cooldown = float(os.getenv('MIGAS_BREAKER_COOLDOWN', DEFAULT_BREAKER_COOLDOWN))
+    with file_lock(state_file.with_suffix('.lock')):
+        state = _read(state_file)
+        if state.get('failures', 0) < threshold:
+            return True
+        now = time.time()
+        # wait for the cooldown to elapse, and for any probe in flight to complete
+        if now - max(state.get('opened', 0), state.get('probe', 0)) < cooldown:
+            return False
+        state['probe'] = now
+        _write(state_file, state)
+    logger.debug('Probing %s://%s after circuit breaker cooldown', *key)
+    return True
+
+
+def record(key: tuple[str, str], success: bool) -> None:
+    """Record the outcome of a call to the server at `key`."""
+    if _threshold() <= 0 or (state_file := _state_file(key)) is None:
+        return
+    if success:
+        if state_file.exists():
+            with file_lock(state_file.with_suffix('.lock')):
+                state_file.unlink(missing_ok=True)
+        return
+
+    state_file.parent.mkdir(mode=0o700, exist_ok=True)
+    with file_lock(state_file.with_suffix('.lock')):
+        state = _read(state_file)
+        state['failures'] = state.get('failures', 0) + 1
+        if state['failures'] >= _threshold():
+            if 'opened' not in state or 'probe' in state:
+                logger.debug('Circuit breaker open for %s://%s', *key)
+            state['opened'] = time.time()
+            state.pop('probe', None)
+        _write(state_file, state)
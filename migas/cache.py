@@ -0,0 +1,85 @@
+"""Per-user on-disk cache of :func:`migas.check_project` responses"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from migas.utils import file_lock
+
+logger = logging.getLogger('migas-py')
+
+DEFAULT_CHECK_TTL = 24 * 60 * 60
+DEFAULT_CHECK_MAX_STALE = 7 * 24 * 60 * 60
+CACHE_FILE = 'check_project.json'
+MAX_ENTRIES = 256
+
+
+def _get_cache_dir() -> Path | None:
+    """Return XDG-aware path for the migas cache directory, or None if unavailable."""
+    try:
+        xdg = os.getenv('XDG_CACHE_HOME')
+        cache_home = Path(xdg) if xdg else (Path.home() / '.cache')
+        return cache_home / 'migas'
+    except RuntimeError:
+        # the home directory cannot be determined
+        return None
+
+
+def _key(endpoint: str, project: str, project_version: str) -> str:
+    return f'{endpoint}\n{project}\n{project_version}'
+
+
+def _read(cache_file: Path) -> dict:
+    try:
+        entries = json.loads(cache_file.read_text())
+    except (OSError, ValueError):
+        return {}
+    return entries if isinstance(entries, dict) else {}
+
+
+def lookup(endpoint: str, project: str, project_version: str) -> tuple[dict, bool] | None:
+    """
+    Return a cached response, and whether it is still fresh.
+
+    Responses are fresh for ``MIGAS_CHECK_TTL`` seconds. After that, they may still be used -
+    while being refreshed - for ``MIGAS_CHECK_MAX_STALE`` more seconds. Setting
+    ``MIGAS_CHECK_TTL`` to 0 disables the cache.
+    """
+    ttl = float(os.getenv('MIGAS_CHECK_TTL', DEFAULT_CHECK_TTL))
+    if ttl <= 0 or (cache_dir := _get_cache_dir()) is None:
+        return None
+    entry = _read(cache_dir / CACHE_FILE).get(_key(endpoint, project, project_version))
+    if not isinstance(entry, dict) or not isinstance(entry.get('response'), dict):
+        return None
+    age = time.time() - entry.get('time', 0)
+    if age < 0 or age > ttl + float(os.getenv('MIGAS_CHECK_MAX_STALE', DEFAULT_CHECK_MAX_STALE)):
+        return None
+    return entry['response'], age <= ttl
+
+
+def store(endpoint: str, project: str, project_version: str, response: dict) -> None:
+    """Cache a successful response. Only the most recent `MAX_ENTRIES` responses are kept."""
+    if not response.get('success') or float(os.getenv('MIGAS_CHECK_TTL', DEFAULT_CHECK_TTL)) <= 0:
+        return
+    if (cache_dir := _get_cache_dir()) is None:
+        return
+    cache_file = cache_dir / CACHE_FILE
+    tmp = cache_file.with_name(f'{cache_file.name}.{os.getpid()}')
+    try:
+        with file_lock(cache_dir / 'cache.lock'):
+            entries = _read(cache_file)
+            entries.pop(key := _key(endpoint, project, project_version), None)
+            entries[key] = {'time': time.time(), 'response': response}
+            # entries are kept in insertion order, oldest first
+            entries = dict(list(entries.items())[-MAX_ENTRIES:])
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp, cache_file)
+    except OSError as e:
+        tmp.unlink(missing_ok=True)
+        logger.debug('Could not cache response: %s', e)
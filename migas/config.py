@@ -1,29 +1,31 @@
-import getpass
 import contextlib
 import json
 import logging
 import os
-import socket
 from collections.abc import Callable
-import uuid
 from dataclasses import dataclass, fields
 from functools import wraps
 from pathlib import Path
-from tempfile import gettempdir
 
-from .utils import compile_info
+# Less common modules (getpass, socket, uuid) are imported when first needed
 
 DEFAULT_ENDPOINT = 'https://migas.nipreps.org'
-DEFAULT_CONFIG_FILE_FMT = str(Path(gettempdir()) / 'migas-{pid}.json').format
+DEFAULT_FQDN_TIMEOUT = 1
+# Seconds before a FQDN lookup that timed out is tried again
+FQDN_RETRY_INTERVAL = 5 * 60
 
 File = str | Path
 
+logger = logging.getLogger('migas-py')
+
 
 def _init_logger(level: str | None = None) -> logging.Logger:
+    """Configure the package logger. Handlers are only added once."""
     if level is None:
         level = os.getenv('MIGAS_LOG_LEVEL', logging.WARNING)
-    logger = logging.getLogger('migas-py')
     logger.setLevel(level)
+    if logger.handlers:
+        return logger
     ch = logging.StreamHandler()
     ch.setLevel(level)
     formatter = logging.Formatter('<%(name)s> [%(levelname)s] %(message)s')
@@ -65,21 +67,40 @@ def _secure_write(filename: File, content: str) -> None:
 
 
 def telemetry_enabled(func: Callable) -> Callable:
-    """Decorator function to verify telemetry collection is enabled."""
+    """
+    Decorator function to verify telemetry collection is enabled.
+
+    Coroutine functions are wrapped by a coroutine function.
+    """
 
     @wraps(func)
     def can_send(*args, **kwargs):
-        if os.getenv('MIGAS_OPTOUT'):
-            # do not communicate with server
-            return {'success': False, 'errors': [{'message': 'migas telemetry is disabled.'}]}
-        if not Config._is_setup:
-            return {
-                'success': False,
-                'errors': [{'message': 'migas setup incomplete - did you call `migas.setup()`?'}],
-            }
+        if (disabled := _telemetry_disabled()) is not None:
+            return disabled
         return func(*args, **kwargs)
 
-    return can_send
+    @wraps(func)
+    async def can_send_async(*args, **kwargs):
+        if (disabled := _telemetry_disabled()) is not None:
+            return disabled
+        return await func(*args, **kwargs)
+
+    # equivalent to inspect.iscoroutinefunction(), without importing inspect
+    is_coroutine = bool(getattr(func, '__code__', None) and func.__code__.co_flags & 0x80)
+    return can_send_async if is_coroutine else can_send
+
+
+def _telemetry_disabled() -> dict | None:
+    """Return the response to use if the server must not be contacted."""
+    if os.getenv('MIGAS_OPTOUT'):
+        # do not communicate with server
+        return {'success': False, 'errors': [{'message': 'migas telemetry is disabled.'}]}
+    if not Config._is_setup:
+        return {
+            'success': False,
+            'errors': [{'message': 'migas setup incomplete - did you call `migas.setup()`?'}],
+        }
+    return None
 
 
 @dataclass(init=False, repr=False, eq=False)
@@ -130,6 +151,8 @@ class Config:
 
         If class was already configured, existing configuration is used.
         """
+        import uuid
+
         if cls._pid is None:
             cls._pid = os.getpid()
         endpoint = endpoint if isinstance(endpoint, str) and endpoint else DEFAULT_ENDPOINT
@@ -169,13 +192,24 @@ class Config:
     @suppress_errors
     def save(cls, filename: File) -> None:
         """Save to a JSON file."""
-        config = {
+        _secure_write(filename, json.dumps(cls._to_dict()))
+        cls._file = filename
+
+    @classmethod
+    @suppress_errors
+    def register(cls) -> None:
+        """Save to the registry of running processes, to be reused by child processes."""
+        from .registry import register
+
+        register(cls._to_dict())
+
+    @classmethod
+    def _to_dict(cls) -> dict:
+        return {
             field: getattr(cls, field)
             for field in cls.__annotations__.keys()
             if field not in ('_is_setup', '_file', '_pid')
         }
-        _secure_write(filename, json.dumps(config))
-        cls._file = filename
 
     @classmethod
     def populate(cls) -> dict:
@@ -206,17 +240,18 @@ def setup(
 
     If `user_id` is not provided, one will be generated.
     """
+    _init_logger()
     loaded = False
     if filename is not None:
         loaded = _try_load(filename)
     else:
-        # check for existing configuration files (current PID, then parent PID)
-        loaded = _try_load(DEFAULT_CONFIG_FILE_FMT(pid=os.getpid()))
-        if not loaded:
-            loaded = _try_load(DEFAULT_CONFIG_FILE_FMT(pid=os.getppid()))
+        # reuse the configuration of this process, or of its closest configured ancestor
+        loaded = _try_load_registered()
 
     # If nothing was loaded, or if explicit overrides are provided, initialize/update Config
     if not loaded or any(x is not None for x in (endpoint, user_id, session_id)):
+        from .utils import compile_info
+
         info = compile_info()
         Config.init(
             endpoint=endpoint,
@@ -229,10 +264,17 @@ def setup(
             is_ci=info['is_ci'],
         )
     if save_config:
-        Config.save(filename or DEFAULT_CONFIG_FILE_FMT(pid=os.getpid()))
+        if filename is not None:
+            Config.save(filename)
+        else:
+            Config.register()
 
     Config._is_setup = True
 
+    from .spool import replay
+
+    replay()
+
 
 def print_config() -> None:
     for field in fields(Config):
@@ -263,6 +305,17 @@ def _try_load(filename) -> bool:
         return False
 
 
+@suppress_errors
+def _try_load_registered() -> bool:
+    """Attempt to load a configuration from the registry. Returns True if successful."""
+    from .registry import lookup
+
+    if (config := lookup()) is None:
+        return False
+    Config.init(**config)
+    return True
+
+
 def gen_uuid(uuid_factory: str = 'safe', container: str | None = None) -> str | None:
     """
     Generate a RFC 4122 UUID.
@@ -271,6 +324,8 @@ def gen_uuid(uuid_factory: str = 'safe', container: str | None = None) -> str |
     - `safe`: Stable across processes; prefers persistent file, then FQDN domain, then hostname.
     - `random`: Random UUID; may collide across multiprocessing setups.
     """
+    import uuid
+
     if uuid_factory == 'safe':
         return _safe_uuid_factory()
     elif uuid_factory == 'random':
@@ -278,16 +333,22 @@ def gen_uuid(uuid_factory: str = 'safe', container: str | None = None) -> str |
     raise NotImplementedError
 
 
-def _get_user_id_file() -> Path | None:
-    """Return XDG-aware path for the persistent user identity file, or None if unavailable."""
+def _get_config_dir() -> Path | None:
+    """Return XDG-aware path for the migas configuration directory, or None if unavailable."""
     try:
         xdg = os.getenv('XDG_CONFIG_HOME')
         config_home = Path(xdg) if xdg else (Path.home() / '.config')
-        return config_home / 'migas' / 'user_id'
+        return config_home / 'migas'
     except Exception:
         return None
 
 
+def _get_user_id_file() -> Path | None:
+    """Return XDG-aware path for the persistent user identity file, or None if unavailable."""
+    config_dir = _get_config_dir()
+    return config_dir / 'user_id' if config_dir is not None else None
+
+
 def _extract_domain(fqdn: str) -> str | None:
     """
     Extract a stable domain from a Fully Qualified Domain Name, stripping the node/host prefix.
@@ -320,6 +381,8 @@ def _safe_uuid_factory() -> str | None:
     if os.getenv('MIGAS_OPTOUT'):
         return None
 
+    import uuid
+
     user_id_file = _get_user_id_file()
 
     # 1. Try loading config file
@@ -343,24 +406,66 @@ def _safe_uuid_factory() -> str | None:
 
 def _get_username() -> str:
     """Get the current username, with fallback to UID-based name."""
+    import getpass
+
     try:
         return getpass.getuser()
     except (KeyError, OSError):
         return f'user-{os.getuid()}'
 
 
+def _resolve_fqdn(timeout: float | None = None) -> str | None:
+    """
+    Resolve the Fully Qualified Domain Name of the host, or None if it takes over `timeout`.
+
+    Reverse DNS lookups can block for a long time on hosts with broken DNS, so the lookup runs
+    in a daemon thread. The result is cached for the host, and a timeout for a few minutes, so
+    that a brief DNS stall does not last until the next reboot.
+    """
+    import socket
+    import threading
+    import time
+
+    from .utils import read_host_cache, update_host_cache
+
+    cache = read_host_cache()
+    if fqdn := cache.get('fqdn'):
+        return fqdn
+    if time.time() < cache.get('fqdn_retry', 0):
+        return None
+
+    if timeout is None:
+        timeout = float(os.getenv('MIGAS_FQDN_TIMEOUT', DEFAULT_FQDN_TIMEOUT))
+    result = []
+    start = time.monotonic()
+    thread = threading.Thread(
+        target=lambda: result.append(socket.getfqdn()), name='migas-fqdn', daemon=True
+    )
+    thread.start()
+    thread.join(timeout)
+    elapsed = time.monotonic() - start
+
+    if not result:
+        logger.debug('FQDN lookup timed out after %.3fs, using hostname', elapsed)
+        update_host_cache(fqdn_retry=time.time() + FQDN_RETRY_INTERVAL)
+        return None
+    logger.debug('FQDN lookup took %.3fs', elapsed)
+    update_host_cache(fqdn=result[0])
+    return result[0]
+
+
 def _generate_stable_uuid() -> str:
     """Generate a stable UUID based on user and system information, or random if it fails."""
+    import socket
+    import uuid
+
     try:
         user = _get_username()
-        fqdn = socket.getfqdn()
-        domain = _extract_domain(fqdn)
+        fqdn = _resolve_fqdn()
+        domain = _extract_domain(fqdn) if fqdn else None
         hostname = os.getenv('HOSTNAME') or socket.gethostname()
 
         name = f'{user}@{domain or hostname}'
         return str(uuid.uuid3(uuid.NAMESPACE_DNS, name))
     except OSError:
         return str(uuid.uuid4())
-
-
-logger = _init_logger()
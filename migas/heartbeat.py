@@ -0,0 +1,179 @@
+"""Periodic heartbeat breadcrumbs for long-running trackers"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from migas.tracker import Tracker
+
+logger = logging.getLogger('migas-py')
+
+DEFAULT_HEARTBEAT_INTERVAL = 60
+DEFAULT_HEARTBEAT_MAX_INTERVAL = 60 * 60
+HEARTBEAT_GROWTH = 2
+# Heartbeats due within this fraction of their interval are sent along with those already due
+COALESCE_FRACTION = 0.25
+
+
+class _Beat:
+    __slots__ = ('count', 'due', 'interval', 'started', 'tracker')
+
+    def __init__(self, tracker: Tracker, interval: float, now: float):
+        self.tracker = tracker
+        self.interval = interval
+        self.started = now
+        self.due = now + interval
+        self.count = 0
+
+    def payload(self, now: float) -> dict:
+        from migas.api.rest import Breadcrumb
+
+        tracker = self.tracker
+        kwargs = {**tracker.crumb_kwargs, 'status': 'R', 'status_desc': 'Heartbeat'}
+        kwargs['metrics'] = {
+            **(kwargs.get('metrics') or {}),
+            'heartbeat': {'count': self.count, 'uptime': round(now - self.started, 1)},
+        }
+        return Breadcrumb.from_config(tracker.project, tracker.version, **kwargs).to_dict()
+
+
+class HeartbeatScheduler:
+    """
+    Send the heartbeats of all trackers in the process from a single, lazily started daemon
+    thread.
+
+    The first heartbeat of a tracker is sent `interval` seconds after it is added, and each
+    following interval is `growth` times longer than the previous one, up to `max_interval`.
+    Heartbeats of other trackers that are nearly due are sent along with those that are due (in
+    a single request, if batching is enabled), and from then on are kept in step with them.
+    """
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_HEARTBEAT_INTERVAL,
+        max_interval: float = DEFAULT_HEARTBEAT_MAX_INTERVAL,
+        growth: float = HEARTBEAT_GROWTH,
+    ):
+        self.interval = max(interval, 0.001)
+        self.max_interval = max(max_interval, self.interval)
+        self.growth = max(growth, 1)
+        self._init_state()
+
+    def _init_state(self) -> None:
+        self._cond = threading.Condition()
+        self._beats: dict[int, _Beat] = {}
+        self._thread = None
+
+    def __len__(self) -> int:
+        return len(self._beats)
+
+    def add(self, tracker: Tracker) -> None:
+        """Start sending heartbeats for `tracker`."""
+        with self._cond:
+            if id(tracker) not in self._beats:
+                self._beats[id(tracker)] = _Beat(tracker, self.interval, time.monotonic())
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='migas-heartbeat', daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def remove(self, tracker: Tracker) -> None:
+        """Stop sending heartbeats for `tracker`."""
+        with self._cond:
+            self._beats.pop(id(tracker), None)
+
+    def _collect(self, now: float) -> list[_Beat]:
+        """Return the heartbeats to send at `now`, and schedule the following ones."""
+        if not any(beat.due <= now for beat in self._beats.values()):
+            return []
+        beats = [
+            beat
+            for beat in self._beats.values()
+            if beat.due - beat.interval * COALESCE_FRACTION <= now
+        ]
+        for beat in beats:
+            beat.count += 1
+            beat.interval = min(beat.interval * self.growth, self.max_interval)
+            beat.due = now + beat.interval
+        return beats
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not (beats := self._collect(now := time.monotonic())):
+                    due = min((beat.due for beat in self._beats.values()), default=None)
+                    self._cond.wait(None if due is None else due - now)
+            try:
+                self._send(beats, now)
+            except Exception as e:
+                logger.debug('Failed to send heartbeat: %s', e, exc_info=True)
+
+    def _send(self, beats: list[_Beat], now: float) -> None:
+        from migas.api.rest import Breadcrumb
+        from migas.batch import get_batcher
+        from migas.config import Config
+        from migas.ratelimit import admit
+        from migas.request import request
+
+        if os.getenv('MIGAS_OPTOUT'):
+            return
+        payloads = []
+        for beat in beats:
+            if not beat.tracker._stopped and admit(Config.endpoint, payload := beat.payload(now)):
+                payloads.append(payload)
+        if not payloads:
+            return
+        if (batcher := get_batcher()) is not None:
+            for payload in payloads:
+                batcher.add(Config.endpoint, payload)
+        else:
+            # the batch route is only known to be supported if batching is enabled
+            for payload in payloads:
+                request(Config.endpoint, path=Breadcrumb._route, json_data=payload)
+
+
+_scheduler: HeartbeatScheduler | None = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> HeartbeatScheduler:
+    """
+    Return the process-wide heartbeat scheduler.
+
+    ``MIGAS_HEARTBEAT_INTERVAL`` and ``MIGAS_HEARTBEAT_MAX_INTERVAL`` (seconds) control the
+    first and the longest interval between heartbeats.
+    """
+    global _scheduler
+
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = HeartbeatScheduler(
+                    interval=float(
+                        os.getenv('MIGAS_HEARTBEAT_INTERVAL') or DEFAULT_HEARTBEAT_INTERVAL
+                    ),
+                    max_interval=float(
+                        os.getenv('MIGAS_HEARTBEAT_MAX_INTERVAL') or DEFAULT_HEARTBEAT_MAX_INTERVAL
+                    ),
+                )
+    return _scheduler
+
+
+def _reinit_after_fork() -> None:
+    global _scheduler_lock
+
+    _scheduler_lock = threading.Lock()
+    if _scheduler is not None:
+        # forked workers report to the process that started the tracker, which keeps beating
+        _scheduler._init_state()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
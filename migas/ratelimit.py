@@ -0,0 +1,119 @@
+"""
+Client-side sampling and rate limiting of breadcrumbs.
+
+Sampling (``MIGAS_SAMPLE_RATE``) is deterministic: whether breadcrumbs are sent depends on a
+hash of the user and session IDs (or the process, without a session ID), so all breadcrumbs of a
+session are either sent or not. Sent breadcrumbs carry the sample rate in their metrics, so the
+server can scale counts back up.
+
+Rate limiting (``MIGAS_RATE_LIMIT``) uses a token bucket per server and project, shared between
+processes on the same host through a small state file in the runtime directory. Breadcrumbs over
+the limit are dropped, except for those reporting how a process ended, which are spooled (if
+``MIGAS_SPOOL`` is enabled) to be sent later.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from migas.utils import file_lock, get_runtime_dir
+
+logger = logging.getLogger('migas-py')
+
+
+def not_admitted() -> dict:
+    """Return the response to a breadcrumb that was sampled out or rate limited."""
+    return {'success': False, 'errors': [{'message': 'Breadcrumb sampled out or rate limited.'}]}
+
+
+def sample_rate() -> float:
+    """Return the fraction of sessions whose breadcrumbs are sent (``MIGAS_SAMPLE_RATE``)."""
+    rate = float(os.getenv('MIGAS_SAMPLE_RATE') or 1)
+    return min(max(rate, 0.0), 1.0)
+
+
+def sampled(payload: dict, rate: float) -> bool:
+    """Whether the session of `payload` is among the sampled fraction `rate` of sessions."""
+    import hashlib
+
+    ctx = payload.get('ctx') or {}
+    # without a session ID, sessions are told apart by process - not by user, which would send
+    # all or none of the breadcrumbs of a large job
+    session = ctx.get('session_id') or os.getpid()
+    key = f'{ctx.get("user_id")}/{session}'
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') < rate * 2**64
+
+
+def _state_file(endpoint: str, project: str) -> Path | None:
+    import zlib
+
+    if (runtime_dir := get_runtime_dir()) is None:
+        return None
+    key = zlib.crc32(f'{endpoint}\n{project}'.encode())
+    return runtime_dir / 'ratelimit' / f'{key:08x}.json'
+
+
+def _read(state_file: Path) -> dict:
+    try:
+        state = json.loads(state_file.read_text())
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def acquire(endpoint: str, project: str) -> bool:
+    """
+    Take a token from the bucket of `project` on `endpoint`. Returns `False` if none is left.
+
+    Buckets refill at ``MIGAS_RATE_LIMIT`` tokens per second, and hold at most
+    ``MIGAS_RATE_BURST`` tokens.
+    """
+    rate = float(os.getenv('MIGAS_RATE_LIMIT') or 0)
+    if rate <= 0 or (state_file := _state_file(endpoint, project)) is None:
+        return True
+    burst = max(float(os.getenv('MIGAS_RATE_BURST') or max(rate, 1)), 1)
+
+    with file_lock(state_file.with_suffix('.lock')):
+        state = _read(state_file)
+        now = time.time()
+        elapsed = max(now - state.get('time', now), 0)
+        tokens = min(state.get('tokens', burst) + elapsed * rate, burst)
+        if allowed := tokens >= 1:
+            tokens -= 1
+        tmp = state_file.with_name(f'{state_file.name}.{os.getpid()}')
+        try:
+            tmp.write_text(json.dumps({'tokens': tokens, 'time': now}))
+            os.replace(tmp, state_file)
+        except OSError as e:
+            tmp.unlink(missing_ok=True)
+            logger.debug('Could not update rate limit: %s', e)
+    return allowed
+
+
+def admit(endpoint: str, payload: dict) -> bool:
+    """
+    Whether to send the breadcrumb `payload`, after sampling and rate limiting.
+
+    The sample rate is added to the metrics of sampled breadcrumbs.
+    """
+    if (rate := sample_rate()) < 1:
+        if not sampled(payload, rate):
+            return False
+        payload['metrics'] = {**(payload.get('metrics') or {}), 'sample_rate': rate}
+    if acquire(endpoint, payload['project']):
+        return True
+
+    from migas.batch import FINAL_STATUSES
+
+    logger.debug('Rate limit exceeded for %s', payload['project'])
+    if (payload.get('proc') or {}).get('status') in FINAL_STATUSES:
+        from migas.api.rest import Breadcrumb
+        from migas.spool import spool_failed
+
+        spool_failed(endpoint, Breadcrumb._route, payload)
+    return False
@@ -0,0 +1,124 @@
+"""
+Registry of the configurations of running processes.
+
+Every configured process records its configuration in one per-user registry file, so that
+child processes (e.g., workers of a parallel pipeline) reuse the configuration of their closest
+configured ancestor. Processes are identified by their PID and start time, so a recycled PID is
+never mistaken for the process that registered it. Entries of processes that have exited are
+removed whenever the registry is written.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+
+from migas.utils import file_lock, get_runtime_dir
+
+logger = logging.getLogger('migas-py')
+
+REGISTRY_FILE = 'sessions.json'
+# Stop walking up the process tree after this many ancestors
+MAX_ANCESTORS = 64
+
+
+def _proc_stat(pid: int) -> list[str] | None:
+    """Return the fields of ``/proc/<pid>/stat`` following the command name, if available."""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # the command name is parenthesized, and may contain spaces or parentheses itself
+    return stat[stat.rfind(b')') + 2 :].decode().split()
+
+
+def process_key(pid: int) -> str | None:
+    """
+    Return a key identifying process `pid`, or None if it is not running.
+
+    Where ``/proc`` is available, the key includes the start time of the process.
+    """
+    if (stat := _proc_stat(pid)) is not None:
+        return f'{pid}:{stat[19]}'
+    if os.path.isdir('/proc/self'):
+        # /proc is available, but the process is not
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except OSError:
+        # exists, but owned by another user
+        pass
+    return str(pid)
+
+
+def _is_running(key: str) -> bool:
+    try:
+        return process_key(int(key.split(':')[0])) == key
+    except ValueError:
+        return False
+
+
+def ancestors() -> list[str]:
+    """Return the keys of the current process and its ancestors, closest first."""
+    keys = []
+    pid = os.getpid()
+    while pid > 1 and len(keys) < MAX_ANCESTORS:
+        if (key := process_key(pid)) is None:
+            break
+        keys.append(key)
+        if pid == os.getpid():
+            pid = os.getppid()
+        elif (stat := _proc_stat(pid)) is not None:
+            pid = int(stat[1])
+        else:
+            # without /proc, only the parent is known
+            break
+    return keys
+
+
+def _registry_file() -> Path | None:
+    runtime_dir = get_runtime_dir()
+    return runtime_dir / REGISTRY_FILE if runtime_dir is not None else None
+
+
+def _read(registry: Path) -> dict:
+    try:
+        entries = json.loads(registry.read_text())
+    except (OSError, ValueError):
+        return {}
+    return entries if isinstance(entries, dict) else {}
+
+
+def lookup() -> dict | None:
+    """Return the configuration of the current process or its closest configured ancestor."""
+    if (registry := _registry_file()) is None:
+        return None
+    # the registry is replaced atomically, so it can be read without holding the lock
+    entries = _read(registry)
+    for key in ancestors():
+        if isinstance(config := entries.get(key), dict):
+            return config
+    return None
+
+
+def register(config: dict) -> None:
+    """Record the configuration of the current process, and drop entries of exited processes."""
+    if (registry := _registry_file()) is None or (key := process_key(os.getpid())) is None:
+        return
+    with file_lock(registry.with_suffix('.lock')):
+        entries = {k: v for k, v in _read(registry).items() if k != key and _is_running(k)}
+        entries[key] = config
+        tmp = registry.with_name(f'{registry.name}.{os.getpid()}')
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp, registry)
+        except OSError as e:
+            tmp.unlink(missing_ok=True)
+            logger.debug('Could not register configuration: %s', e)
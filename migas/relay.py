@@ -0,0 +1,196 @@
+"""
+Relay of breadcrumbs from the processes of a user on the same node.
+
+Run the relay with ``python -m migas.relay``. It listens on a Unix datagram socket in the
+per-user runtime directory, and forwards the breadcrumbs it receives over pooled connections. They
+are sent in batches only if batching is enabled with ``MIGAS_BATCH_SIZE`` (i.e., the server
+accepts batches), and one request each otherwise. While a relay is running, breadcrumbs that are not waited for are handed to it with
+a single local datagram, instead of being sent by each process over its own connection. If the
+relay is not running, is overloaded, or a breadcrumb is too large for a datagram, breadcrumbs are
+sent directly as usual.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import time
+from pathlib import Path
+
+from migas.utils import file_lock, get_runtime_dir
+
+logger = logging.getLogger('migas-py')
+
+SOCKET_FILE = 'relay.sock'
+DEFAULT_RELAY_BATCH_SIZE = 100
+DEFAULT_RELAY_BATCH_AGE = 1
+MAX_DATAGRAM_SIZE = 256 * 1024
+# Seconds to wait before looking for a relay again, once none was found
+RETRY_INTERVAL = 1
+# Seconds to wait for room in the queue of a busy relay (only a few datagrams may be queued)
+SEND_TIMEOUT = 0.05
+
+# Whether this process is the relay - it must not relay breadcrumbs to itself
+_serving = False
+_client: socket.socket | None = None
+_retry_at = 0.0
+_socket_paths: dict[str, Path | None] = {}
+
+
+def _socket_path() -> Path | None:
+    from migas.utils import _tempdir
+
+    # checking the runtime directory takes a few system calls - only do so once
+    base = os.getenv('MIGAS_RUNTIME_DIR') or _tempdir()
+    if base not in _socket_paths:
+        runtime_dir = get_runtime_dir()
+        _socket_paths[base] = runtime_dir / SOCKET_FILE if runtime_dir is not None else None
+    return _socket_paths[base]
+
+
+def send(url: str, path: str | None, json_data: dict | list) -> bool:
+    """
+    Hand breadcrumbs to the relay. Returns `False` if they must be sent directly instead.
+
+    Setting ``MIGAS_RELAY=0`` disables the relay.
+    """
+    global _client, _retry_at
+
+    if _serving or not hasattr(socket, 'AF_UNIX') or time.monotonic() < _retry_at:
+        return False
+    if os.getenv('MIGAS_RELAY', '').lower() in ('0', 'false', 'off'):
+        return False
+    from migas.api.rest import Breadcrumb
+
+    if path not in (Breadcrumb._route, Breadcrumb._batch_route):
+        return False
+    if (socket_path := _socket_path()) is None:
+        return False
+    data = json.dumps({'endpoint': url, 'path': path, 'payload': json_data}).encode()
+    if len(data) > MAX_DATAGRAM_SIZE:
+        return False
+    try:
+        if _client is None:
+            import atexit
+
+            _client = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            _client.settimeout(SEND_TIMEOUT)
+            atexit.register(_client.close)
+        _client.sendto(data, str(socket_path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        # no relay is running
+        _retry_at = time.monotonic() + RETRY_INTERVAL
+        return False
+    except OSError as e:
+        # the relay is busy, or the datagram too large
+        logger.debug('Could not hand breadcrumbs to relay: %s', e)
+        return False
+    return True
+
+
+class Relay:
+    """
+    Receive breadcrumbs on a Unix datagram socket, and forward them once `batch_size` are queued,
+    or once the oldest is `batch_age` seconds old. Breadcrumbs the server does not accept are
+    spooled (if ``MIGAS_SPOOL`` is enabled).
+
+    Only one relay may run per user and node.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = DEFAULT_RELAY_BATCH_SIZE,
+        batch_age: float = DEFAULT_RELAY_BATCH_AGE,
+    ):
+        from migas.batch import BreadcrumbBatcher, batching_enabled
+
+        self.socket_path = _socket_path()
+        if self.socket_path is None:
+            raise RuntimeError('No runtime directory is available for the relay socket')
+        # the batch route is only used if the server is known to accept batches
+        self.batcher = BreadcrumbBatcher(
+            batch_size, max_age=batch_age, batch_route=batching_enabled()
+        )
+        self.received = 0
+        self._stopping = False
+
+    def serve_forever(self, poll_interval: float = 0.5) -> bool:
+        """Forward breadcrumbs until :meth:`shutdown`. Returns `False` if a relay is running."""
+        global _serving
+
+        with file_lock(self.socket_path.with_suffix('.lock'), blocking=False) as acquired:
+            if not acquired:
+                logger.warning('A relay is already running on %s', self.socket_path)
+                return False
+            _serving = True
+            # the socket of a relay that did not exit cleanly
+            self.socket_path.unlink(missing_ok=True)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                sock.bind(str(self.socket_path))
+                os.chmod(self.socket_path, 0o600)
+                sock.settimeout(poll_interval)
+                logger.info('Relay listening on %s', self.socket_path)
+                while not self._stopping:
+                    try:
+                        data = sock.recv(MAX_DATAGRAM_SIZE)
+                    except TimeoutError:
+                        continue
+                    self._handle(data)
+            finally:
+                self.socket_path.unlink(missing_ok=True)
+                sock.close()
+                self.batcher.flush()
+        return True
+
+    def shutdown(self) -> None:
+        self._stopping = True
+
+    def _handle(self, data: bytes) -> None:
+        try:
+            message = json.loads(data)
+            endpoint, payload = message['endpoint'], message['payload']
+        except (ValueError, TypeError, KeyError):
+            logger.debug('Relay received an invalid message')
+            return
+        for crumb in payload if isinstance(payload, list) else [payload]:
+            if isinstance(crumb, dict):
+                self.received += 1
+                self.batcher.add(endpoint, crumb)
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+    import signal
+
+    parser = argparse.ArgumentParser(
+        prog='python -m migas.relay', description='Relay breadcrumbs of local processes.'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=DEFAULT_RELAY_BATCH_SIZE,
+        help='number of breadcrumbs forwarded together (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--batch-age',
+        type=float,
+        default=DEFAULT_RELAY_BATCH_AGE,
+        help='seconds before a partial batch is sent (default: %(default)s)',
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig()
+    relay = Relay(batch_size=args.batch_size, batch_age=args.batch_age)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: relay.shutdown())
+    return 0 if relay.serve_forever() else 1
+
+
+if __name__ == '__main__':
+    # run as `migas.relay`, whose state is checked when sending breadcrumbs, not as `__main__`
+    from migas.relay import main
+
+    raise SystemExit(main())
@@ -2,47 +2,210 @@
 
 from __future__ import annotations
 
+import functools
 import json
+import logging
 import os
-import ssl
+import queue
+import threading
+import time
 import warnings
-from http.client import HTTPConnection, HTTPResponse, HTTPSConnection
-from urllib.parse import urlparse
-from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Callable
+from typing import TYPE_CHECKING
 
 from . import __version__
 
+if TYPE_CHECKING:
+    import ssl
+    from email.message import Message
+    from http.client import HTTPConnection, HTTPResponse, HTTPSConnection
+
+# http.client, ssl and urllib are imported on first use, to keep telemetry-free runs cheap
+
 MigasResponse = tuple[int, dict | str]  # status code, body
 
 DEFAULT_TIMEOUT = 3
+DEFAULT_QUEUE_SIZE = 256
+DEFAULT_POOL_SIZE = 2
+DEFAULT_POOL_IDLE_TIMEOUT = 30
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_RESPONSE_SIZE = 16 * 1024 * 1024
+DEFAULT_COMPRESS_MIN_SIZE = 1024
 TIMEOUT_RESPONSE = (
     408,
     {'data': None, 'errors': [{'message': 'Connection to server timed out.'}]},
 )
 UNAVAIL_RESPONSE = (503, {'data': None, 'errors': [{'message': 'Could not connect to server.'}]})
+OVERSIZED_RESPONSE = (
+    502,
+    {'data': None, 'errors': [{'message': 'Server response exceeded the maximum size.'}]},
+)
+RELAYED_RESPONSE = (202, {'success': True})
+
+logger = logging.getLogger('migas-py')
 
 
 def request(
     url: str,
     *,
     query: str | None = None,
+    variables: dict | None = None,
     path: str | None = None,
-    json_data: dict | None = None,
+    json_data: dict | list | None = None,
     timeout: float | None = None,
     method: str = 'POST',
     chunk_size: int | None = None,
     wait: bool = False,
 ) -> MigasResponse | None:
     """
-    Send a non-blocking call to the server.
+    Send a call to the server.
+
+    By default, the call is queued on a long-lived background sender and this function returns
+    immediately. No assumptions can be made about server receptivity; use :func:`flush` to
+    wait for queued calls to complete.
+
+    If `wait` is enabled, the call is made in the current thread and the response is returned.
+    Otherwise, breadcrumbs are handed to the node's relay (see :mod:`migas.relay`), if running.
+    """
+    kwargs = {
+        'query': query,
+        'variables': variables,
+        'path': path,
+        'json_data': json_data,
+        'timeout': timeout,
+        'method': method,
+        'chunk_size': chunk_size,
+        'wait': wait,
+    }
+    if wait is True:
+        return _request(url, **kwargs)
+    if json_data is not None:
+        from . import relay
+
+        if relay.send(url, path, json_data):
+            return
+    _sender.submit(_request, url, **kwargs)
+
+
+def flush(timeout: float | None = None) -> bool:
+    """
+    Block until all queued calls have been sent.
+
+    Returns `False` if `timeout` seconds elapsed before the queue was drained.
+    """
+    return _sender.flush(timeout)
+
+
+def shutdown(timeout: float | None = None) -> bool:
+    """
+    Flush any queued calls and stop the background sender.
 
-    This will never check the future, and no assumptions can be made about server receptivity.
+    The sender is restarted on the next call to :func:`request`.
     """
-    with ThreadPoolExecutor() as executor:
-        future = executor.submit(
-            _request,
+    return _sender.shutdown(timeout)
+
+
+def _request(
+    url: str,
+    *,
+    query: str | None = None,
+    variables: dict | None = None,
+    path: str | None = None,
+    json_data: dict | list | None = None,
+    timeout: float | None = None,
+    method: str = 'POST',
+    chunk_size: int | None = None,
+    wait: bool = False,
+) -> MigasResponse:
+    if json_data is not None and not wait:
+        from . import relay
+
+        if relay.send(url, path, json_data):
+            return RELAYED_RESPONSE
+    res = _send_request(
+        url,
+        query=query,
+        variables=variables,
+        path=path,
+        json_data=json_data,
+        timeout=timeout,
+        method=method,
+        chunk_size=chunk_size,
+        wait=wait,
+    )
+    if json_data is not None and (res is TIMEOUT_RESPONSE or res is UNAVAIL_RESPONSE):
+        # keep breadcrumbs that could not be delivered, if spooling is enabled
+        from .spool import spool_failed
+
+        spool_failed(url, path, json_data)
+    return res
+
+
+def _send_request(
+    url: str,
+    *,
+    query: str | None = None,
+    variables: dict | None = None,
+    path: str | None = None,
+    json_data: dict | list | None = None,
+    timeout: float | None = None,
+    method: str = 'POST',
+    chunk_size: int | None = None,
+    wait: bool = False,
+) -> MigasResponse:
+    timeout = timeout or float(os.getenv('MIGAS_TIMEOUT', DEFAULT_TIMEOUT))
+    key, request_path, headers, body = _prepare_request(
+        url, query=query, variables=variables, path=path, json_data=json_data, wait=wait
+    )
+    from . import breaker
+
+    if not breaker.allow(key):
+        return UNAVAIL_RESPONSE
+
+    # A pooled connection may have been closed by the server while idle - in that case,
+    # retry once on a fresh connection.
+    reuse = True
+    while True:
+        conn, reused = _pool.acquire(key, timeout, reuse=reuse)
+        try:
+            conn.request(method, request_path, body=body, headers=headers)
+            response = conn.getresponse()
+            content = _read_response(response, chunk_size)
+        except _ResponseTooLarge as e:
+            # the rest of the body was not read, so the connection cannot be reused
+            conn.close()
+            logger.debug(e)
+            return OVERSIZED_RESPONSE
+        except TimeoutError:
+            conn.close()
+            breaker.record(key, success=False)
+            return TIMEOUT_RESPONSE
+        except (ConnectionError, OSError):
+            conn.close()
+            if reused:
+                reuse = False
+                continue
+            breaker.record(key, success=False)
+            return UNAVAIL_RESPONSE
+        except BaseException:
+            conn.close()
+            raise
+        break
+
+    breaker.record(key, success=True)
+    if key[0] == 'https':
+        # TLS 1.3 session tickets are only available once data has been received
+        conn.save_session()
+    if response.will_close:
+        conn.close()
+    else:
+        _pool.release(key, conn)
+
+    if _check_compression(key, response.status, headers, response.headers):
+        return _send_request(
             url,
             query=query,
+            variables=variables,
             path=path,
             json_data=json_data,
             timeout=timeout,
@@ -50,34 +213,25 @@ def request(
             chunk_size=chunk_size,
             wait=wait,
         )
+    return _process_response(response.status, response.headers, content)
 
-        if wait is True:
-            return future.result()
 
-
-def _request(
+def _prepare_request(
     url: str,
     *,
     query: str | None = None,
+    variables: dict | None = None,
     path: str | None = None,
-    json_data: dict | None = None,
-    timeout: float | None = None,
-    method: str = 'POST',
-    chunk_size: int | None = None,
+    json_data: dict | list | None = None,
     wait: bool = False,
-) -> MigasResponse:
+) -> tuple[tuple[str, str], str, dict, bytes | None]:
+    """Return the connection key, request path, headers and body of a request to `url`."""
+    from urllib.parse import urlparse
 
     purl = urlparse(url)
-    timeout = timeout or float(os.getenv('MIGAS_TIMEOUT', DEFAULT_TIMEOUT))
-    match purl.scheme:
-        case 'https':
-            conn = HTTPSConnection(
-                purl.netloc, timeout=timeout, context=ssl.create_default_context()
-            )
-        case 'http':
-            conn = HTTPConnection(purl.netloc, timeout=timeout)
-        case _:
-            raise ValueError('URL scheme not supported')
+    if purl.scheme not in ('http', 'https'):
+        raise ValueError('URL scheme not supported')
+    key = (purl.scheme, purl.netloc)
 
     headers = {
         'User-Agent': f'migas-client/{__version__}',
@@ -87,68 +241,365 @@ def _request(
     }
     body = None
     if query:
-        body = json.dumps({'query': query}).encode('utf-8')
+        operation = {'query': query, 'variables': variables} if variables else {'query': query}
+        body = json.dumps(operation).encode('utf-8')
     elif json_data:
         body = json.dumps(json_data).encode('utf-8')
 
+    if body and _should_compress(key, len(body)):
+        import zlib
+
+        compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+        body = compressor.compress(body) + compressor.flush()
+        headers['Content-Encoding'] = 'gzip'
     if body:
         headers['Content-Length'] = len(body)
 
-    request_path = purl.path
+    request_path = purl.path or '/'
     if path:
         request_path = os.path.join(request_path, path.lstrip('/'))
 
     if wait and not query:
         sep = '&' if '?' in request_path else '?'
         request_path += f'{sep}wait=true'
+    return key, request_path, headers, body
 
-    try:
-        conn.request(method, request_path, body=body, headers=headers)
-        response = conn.getresponse()
-        encoding = response.headers.get('content-encoding')
-        body = _read_response(response, encoding, chunk_size)
-    except TimeoutError:
-        return TIMEOUT_RESPONSE
-    except (ConnectionError, OSError):
-        return UNAVAIL_RESPONSE
-    finally:
-        conn.close()
 
-    if body and response.headers.get('content-type', '').startswith('application/json'):
-        body = json.loads(body)
+# Whether each server, by connection key, accepts gzip request bodies
+_compression: dict[tuple[str, str], bool] = {}
+
+
+def _should_compress(key: tuple[str, str], size: int) -> bool:
+    """
+    Whether to compress a request body of `size` bytes.
+
+    By default (``MIGAS_COMPRESS=auto``), bodies are only compressed once the server has
+    advertised support with an ``Accept-Encoding`` response header (RFC 7694). Compression can
+    be forced on or off with ``MIGAS_COMPRESS=1`` / ``MIGAS_COMPRESS=0``.
+    """
+    mode = os.getenv('MIGAS_COMPRESS', 'auto').lower()
+    if mode in ('0', 'false', 'off') or _compression.get(key) is False:
+        return False
+    if size < int(os.getenv('MIGAS_COMPRESS_MIN_SIZE', DEFAULT_COMPRESS_MIN_SIZE)):
+        return False
+    return _compression.get(key, False) if mode == 'auto' else True
+
 
-    if not response.headers.get('X-Backend-Server'):
+def _check_compression(
+    key: tuple[str, str], status: int, request_headers: dict, headers: Message
+) -> bool:
+    """
+    Record whether the server accepts gzip request bodies.
+
+    Returns True if a compressed request was rejected, and should be sent again uncompressed.
+    """
+    if status == 415 and 'Content-Encoding' in request_headers:
+        logger.debug('Server rejected compressed request, disabling compression')
+        _compression[key] = False
+        return True
+    if key not in _compression and 'gzip' in headers.get('Accept-Encoding', '').lower():
+        _compression[key] = True
+    return False
+
+
+def _process_response(status: int, headers: Message, content: bytes | bytearray) -> MigasResponse:
+    """Decode a JSON response body, and check the server identifies itself."""
+    if content and headers.get('content-type', '').startswith('application/json'):
+        # the JSON decoder accepts bytes, sparing a copy into a string
+        content = json.loads(content)
+    else:
+        content = content.decode()
+
+    if not headers.get('X-Backend-Server'):
         warnings.warn('migas server is incorrectly configured.', UserWarning, stacklevel=1)
-    return response.status, body
+    return status, content
 
 
-def _read_response(
-    response: HTTPResponse, encoding: str | None = None, chunk_size: int | None = None
-) -> str:
+def _read_response(response: HTTPResponse, chunk_size: int | None = None) -> bytearray:
     """
-    Read and aggregate the response body.
+    Read and decode the response body, `chunk_size` bytes at a time.
 
-    If `chunk_size` is `None`, the entire response is read at once.
+    Compressed chunks are decompressed as they arrive. Raises `_ResponseTooLarge` if the
+    decoded body exceeds ``MIGAS_MAX_RESPONSE_SIZE`` bytes.
     """
-    stream = b''
+    decoder = _ResponseDecoder(response.headers.get('content-encoding'))
+    decoder.check_length(response.length)
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
     while chunk := response.read(chunk_size):
-        stream += chunk
+        decoder.feed(chunk)
+    return decoder.finish()
+
+
+class _ResponseTooLarge(ValueError):
+    pass
+
+
+class _ResponseDecoder:
+    """Incrementally decompress a response body into a single buffer, up to a maximum size."""
 
-    if encoding:
-        stream = _decompress_stream(stream, encoding)
-    return stream.decode()
+    def __init__(self, encoding: str | None = None, max_size: int | None = None):
+        if max_size is None:
+            max_size = int(os.getenv('MIGAS_MAX_RESPONSE_SIZE', DEFAULT_MAX_RESPONSE_SIZE))
+        self.max_size = max_size
+        self.buffer = bytearray()
+        self._decompressor = _decompressor(encoding) if encoding else None
 
+    def check_length(self, length: int | None) -> None:
+        """Fail early if an uncompressed body of `length` bytes is too large."""
+        if self._decompressor is None and length is not None and length > self.max_size:
+            raise _ResponseTooLarge(f'Response body of {length} bytes is too large')
+
+    def feed(self, chunk: bytes) -> None:
+        if self._decompressor is not None:
+            # never inflate more than the remaining allowance, to defuse decompression bombs
+            chunk = self._decompressor.decompress(chunk, self._remaining() + 1)
+            if self._decompressor.unconsumed_tail:
+                raise self._too_large()
+        self._append(chunk)
+
+    def finish(self) -> bytearray:
+        if self._decompressor is not None:
+            self._append(self._decompressor.flush())
+        return self.buffer
+
+    def _remaining(self) -> int:
+        return self.max_size - len(self.buffer)
+
+    def _append(self, data: bytes) -> None:
+        if len(data) > self._remaining():
+            raise self._too_large()
+        self.buffer += data
+
+    def _too_large(self) -> _ResponseTooLarge:
+        return _ResponseTooLarge(f'Response body exceeds {self.max_size} bytes')
+
+
+def _decompressor(encoding: str):
+    import zlib
 
-def _decompress_stream(stream: bytes, encoding: str) -> bytes:
-    """Decompress the compressed response byte stream."""
     match encoding:
         case 'gzip':
-            import gzip
-
-            return gzip.decompress(stream)
+            return zlib.decompressobj(zlib.MAX_WBITS | 16)
         case 'deflate':
-            import zlib
-
-            return zlib.decompress(stream)
+            return zlib.decompressobj()
         case _:
             raise NotImplementedError(f'Cannot decode response with encoding "{encoding}"')
+
+
+class _ConnectionPool:
+    """
+    Thread-safe pool of idle HTTP/1.1 keep-alive connections, keyed by (scheme, netloc).
+
+    The number of idle connections kept per endpoint (``MIGAS_POOL_SIZE``) and how long an idle
+    connection may be reused (``MIGAS_POOL_IDLE_TIMEOUT``, in seconds) can be configured through
+    the environment. Setting ``MIGAS_POOL_SIZE=0`` disables connection reuse.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle: dict[tuple[str, str], list[tuple[float, HTTPConnection]]] = {}
+
+    def acquire(
+        self, key: tuple[str, str], timeout: float, reuse: bool = True
+    ) -> tuple[HTTPConnection, bool]:
+        """Return a connection for `key`, and whether it is a reused idle connection."""
+        if not reuse:
+            return _new_connection(key, timeout), False
+        idle_timeout = float(os.getenv('MIGAS_POOL_IDLE_TIMEOUT', DEFAULT_POOL_IDLE_TIMEOUT))
+        now = time.monotonic()
+        expired = []
+        conn = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                released, candidate = idle.pop()
+                if now - released < idle_timeout:
+                    conn = candidate
+                    break
+                expired.append(candidate)
+        for stale in expired:
+            stale.close()
+
+        if conn is None:
+            return _new_connection(key, timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def release(self, key: tuple[str, str], conn: HTTPConnection) -> None:
+        """Return a connection to the pool, or close it if the pool is full."""
+        size = int(os.getenv('MIGAS_POOL_SIZE', DEFAULT_POOL_SIZE))
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < size:
+                idle.append((time.monotonic(), conn))
+                return
+        conn.close()
+
+    def clear(self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for _, conn in conns:
+                conn.close()
+
+    def _reinit(self) -> None:
+        """Forget connections inherited from the parent process without touching the sockets."""
+        self._lock = threading.Lock()
+        self._idle = {}
+
+
+def _new_connection(key: tuple[str, str], timeout: float) -> HTTPConnection:
+    from http.client import HTTPConnection
+
+    scheme, netloc = key
+    if scheme == 'https':
+        return _https_connection_class()(netloc, timeout=timeout, context=_ssl_context())
+    return HTTPConnection(netloc, timeout=timeout)
+
+
+@functools.cache
+def _ssl_context() -> ssl.SSLContext:
+    """
+    Return the process-wide SSL context.
+
+    Creating a context loads the system CA bundle, so it is only done once, on first use.
+    """
+    import ssl
+
+    return ssl.create_default_context()
+
+
+# Most recent TLS session negotiated with each host, used to resume later handshakes
+_tls_sessions: dict[str, ssl.SSLSession] = {}
+
+
+@functools.cache
+def _https_connection_class() -> type[HTTPSConnection]:
+    """Return the HTTPS connection class, which is defined on first use."""
+    from http.client import HTTPConnection, HTTPSConnection
+
+    class _HTTPSConnection(HTTPSConnection):
+        """HTTPS connection that resumes the last TLS session negotiated with the same host."""
+
+        def connect(self) -> None:
+            HTTPConnection.connect(self)
+            server_hostname = self._tunnel_host or self.host
+            self.sock = self._context.wrap_socket(
+                self.sock,
+                server_hostname=server_hostname,
+                session=_tls_sessions.get(server_hostname),
+            )
+
+        def save_session(self) -> None:
+            """Remember the current TLS session so future connections can resume it."""
+            session = getattr(self.sock, 'session', None)
+            if session is not None:
+                _tls_sessions[self._tunnel_host or self.host] = session
+
+        def close(self) -> None:
+            self.save_session()
+            super().close()
+
+    return _HTTPSConnection
+
+
+class _Sender:
+    """
+    Send queued calls from a single, lazily started daemon thread.
+
+    The queue is bounded - if the server is slow and the queue fills up, new calls are dropped
+    rather than blocking the caller. When the interpreter exits, queued calls are given what is
+    left of the exit budget (``MIGAS_EXIT_BUDGET_MS``) to complete.
+    """
+
+    _STOP = object()
+
+    def __init__(self, maxsize: int = DEFAULT_QUEUE_SIZE):
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize)
+        self._thread = None
+        self._atexit = False
+
+    def submit(self, func: Callable, *args, **kwargs) -> bool:
+        """Queue `func` to be called in the background. Returns `False` if the call was dropped."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((func, args, kwargs))
+        except queue.Full:
+            logger.debug('Request queue is full, dropping call')
+            return False
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until all queued calls are processed, or until `timeout` seconds elapse."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                if deadline is None:
+                    self._queue.all_tasks_done.wait()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: float | None = None) -> bool:
+        """Flush pending calls and stop the worker thread."""
+        flushed = self.flush(timeout)
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            try:
+                self._queue.put_nowait((self._STOP, (), {}))
+            except queue.Full:
+                pass
+        return flushed
+
+    def _flush_at_exit(self) -> None:
+        from migas.tracker import _exit_timeout
+
+        self.flush(_exit_timeout())
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='migas-sender', daemon=True)
+                self._thread.start()
+            if not self._atexit:
+                import atexit
+
+                # the daemon thread is stopped abruptly at exit - send what is queued first
+                atexit.register(self._flush_at_exit)
+                self._atexit = True
+
+    def _run(self) -> None:
+        while True:
+            func, args, kwargs = self._queue.get()
+            try:
+                if func is self._STOP:
+                    return
+                func(*args, **kwargs)
+            except Exception as e:
+                logger.debug('Background request failed: %s', e, exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    def _reinit(self) -> None:
+        """Discard inherited state in a forked child - the worker thread does not survive."""
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(self._maxsize)
+        self._thread = None
+
+
+_pool = _ConnectionPool()
+_sender = _Sender()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_pool._reinit)
+    os.register_at_fork(after_in_child=_sender._reinit)
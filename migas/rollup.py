@@ -0,0 +1,266 @@
+"""
+Local rollup of breadcrumbs from repeated, short-lived processes.
+
+With ``MIGAS_ROLLUP`` enabled, breadcrumbs are not sent one by one. Instead, their outcome
+(project, version, status and error type) is appended as a fixed-size record to a file shared by
+the processes of the user on the host. Once every ``MIGAS_ROLLUP_INTERVAL`` seconds, a single
+process - elected through a non-blocking lock - sends one breadcrumb per distinct outcome, with
+the number of times it occurred. Traffic then grows with the number of distinct outcomes, rather
+than with the number of processes.
+
+Outcomes that could not be sent are kept as a single record carrying their count. Once the file
+reaches ``MIGAS_ROLLUP_MAX_BYTES``, it is compacted to one record per outcome, keeping the most
+frequent ones if needed. Outcomes the server rejects for good are dropped.
+
+Breadcrumbs with metrics (e.g., from trackers with ``resources=True``), or with fields too long
+for a record, are sent as usual.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import struct
+import time
+from pathlib import Path
+
+from migas.utils import file_lock, get_runtime_dir
+
+logger = logging.getLogger('migas-py')
+
+DEFAULT_ROLLUP_INTERVAL = 300
+DEFAULT_ROLLUP_MAX_BYTES = 256 * 1024
+# Count, first and last times (seconds since the epoch), status, project, version and error type
+RECORD = struct.Struct('<III1s91s32s32s')
+_FIELD_SIZES = (1, 91, 32, 32)
+SUMMARY_BATCH_SIZE = 100
+
+
+def rollup_enabled() -> bool:
+    """Rollup is opt-in, through the ``MIGAS_ROLLUP`` environment variable."""
+    return bool(os.getenv('MIGAS_ROLLUP')) and not os.getenv('MIGAS_OPTOUT')
+
+
+def _rollup_file(endpoint: str) -> Path | None:
+    import zlib
+
+    if (runtime_dir := get_runtime_dir()) is None:
+        return None
+    return runtime_dir / 'rollup' / f'{zlib.crc32(endpoint.encode()):08x}.bin'
+
+
+def _pack(payload: dict) -> bytes | None:
+    """Return the record of a breadcrumb, or None if it does not fit in one."""
+    proc = payload.get('proc') or {}
+    fields = [
+        (value or '').encode()
+        for value in (
+            proc.get('status'),
+            payload.get('project'),
+            payload.get('project_version'),
+            proc.get('error_type'),
+        )
+    ]
+    if any(len(value) > size for value, size in zip(fields, _FIELD_SIZES)):
+        return None
+    now = int(time.time())
+    return RECORD.pack(1, now, now, *fields)
+
+
+def _pack_outcomes(outcomes: dict[tuple[str, ...], list[int]]) -> bytes:
+    """Return a single record per outcome, carrying its count and first and last times."""
+    return b''.join(
+        RECORD.pack(*entry, *(field.encode() for field in key)) for key, entry in outcomes.items()
+    )
+
+
+def _unpack(data: bytes) -> dict[tuple[str, ...], list[int]]:
+    """Count the records in `data` by outcome, along with their first and last times."""
+    outcomes = {}
+    # a record cut short by a crash is ignored
+    for count, first, last, *fields in RECORD.iter_unpack(
+        data[: len(data) - len(data) % RECORD.size]
+    ):
+        key = tuple(field.rstrip(b'\0').decode(errors='replace') for field in fields)
+        if (entry := outcomes.get(key)) is None:
+            outcomes[key] = [count, first, last]
+            continue
+        entry[0] += count
+        entry[1] = min(entry[1], first)
+        entry[2] = max(entry[2], last)
+    return outcomes
+
+
+def _append(rollup_file: Path, data: bytes) -> None:
+    """
+    Append records to the rollup.
+
+    Once the rollup would exceed ``MIGAS_ROLLUP_MAX_BYTES``, it is compacted to a single record
+    per outcome. If the outcomes take over half the limit, only the most frequent are kept.
+    """
+    max_bytes = int(os.getenv('MIGAS_ROLLUP_MAX_BYTES') or DEFAULT_ROLLUP_MAX_BYTES)
+    with file_lock(rollup_file.with_suffix('.lock')):
+        try:
+            size = rollup_file.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size + len(data) <= max_bytes:
+            fd = os.open(rollup_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+            return
+
+        current = rollup_file.read_bytes() if size else b''
+        # drop a record cut short by a crash
+        outcomes = _unpack(current[: len(current) - len(current) % RECORD.size] + data)
+        if (limit := max(max_bytes // 2 // RECORD.size, 1)) < len(outcomes):
+            logger.debug('Rollup is full, dropping %d outcomes', len(outcomes) - limit)
+            kept = sorted(outcomes.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+            outcomes = dict(kept)
+        # not named like claimed rollups, which are read without the lock
+        tmp = rollup_file.with_suffix('.compact')
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.write(fd, _pack_outcomes(outcomes))
+        finally:
+            os.close(fd)
+        os.replace(tmp, rollup_file)
+
+
+def record(endpoint: str, payload: dict, timeout: float | None = None) -> bool:
+    """
+    Add the outcome of a breadcrumb to the rollup, and send the rollup if it is due.
+
+    Returns `False` if rollup is disabled, or the breadcrumb should be sent as usual.
+    """
+    if not rollup_enabled() or payload.get('metrics'):
+        return False
+    if (rollup_file := _rollup_file(endpoint)) is None or (data := _pack(payload)) is None:
+        return False
+    try:
+        _append(rollup_file, data)
+    except OSError as e:
+        logger.debug('Could not record breadcrumb in rollup: %s', e)
+        return False
+    if _due(rollup_file):
+        flush(endpoint, timeout=timeout)
+    return True
+
+
+def _due(rollup_file: Path) -> bool:
+    """Whether the rollup interval has elapsed since the last summary was sent."""
+    interval = float(os.getenv('MIGAS_ROLLUP_INTERVAL') or DEFAULT_ROLLUP_INTERVAL)
+    stamp = rollup_file.with_suffix('.sent')
+    try:
+        return time.time() - stamp.stat().st_mtime >= interval
+    except FileNotFoundError:
+        # the interval starts with the first record
+        stamp.touch(mode=0o600)
+        return interval <= 0
+    except OSError:
+        return False
+
+
+def flush(endpoint: str, force: bool = False, timeout: float | None = None) -> int:
+    """
+    Send the rollup summary for `endpoint`, if it is due (or `force` is enabled).
+
+    Nothing is sent if another process is already sending it. Outcomes that could not be sent are
+    kept for the next summary, unless the server rejected them for good. Returns the number of
+    summary breadcrumbs sent.
+    """
+    if (rollup_file := _rollup_file(endpoint)) is None or (timeout is not None and timeout <= 0):
+        return 0
+    with file_lock(rollup_file.with_suffix('.send.lock'), blocking=False) as elected:
+        if not elected or not (force or _due(rollup_file)):
+            return 0
+        rollup_file.with_suffix('.sent').touch(mode=0o600)
+        claimed = rollup_file.with_name(f'{rollup_file.name}.{os.getpid()}')
+        with file_lock(rollup_file.with_suffix('.lock')):
+            try:
+                os.replace(rollup_file, claimed)
+            except FileNotFoundError:
+                pass
+        data = bytearray()
+        # include records claimed by senders that did not get to send them
+        for path in rollup_file.parent.glob(f'{rollup_file.name}.*'):
+            try:
+                records = path.read_bytes()
+                path.unlink()
+                # a record cut short by a crash is ignored
+                data += records[: len(records) - len(records) % RECORD.size]
+            except OSError as e:
+                logger.debug('Could not read rollup: %s', e)
+        outcomes = _unpack(data)
+        sent, kept = _send(endpoint, outcomes, timeout)
+        if kept:
+            try:
+                _append(
+                    rollup_file, _pack_outcomes({k: v for k, v in outcomes.items() if k in kept})
+                )
+            except OSError as e:
+                logger.debug('Could not keep rollup: %s', e)
+        return sent
+
+
+def _send(endpoint: str, outcomes: dict, timeout: float | None) -> tuple[int, set]:
+    """
+    Send a summary breadcrumb per outcome. Returns the number sent, and the outcomes to keep for
+    the next summary.
+    """
+    from migas.api.rest import Breadcrumb
+    from migas.batch import batching_enabled
+
+    payloads = {}
+    for key, (count, first, last) in outcomes.items():
+        status, project, version, error_type = key
+        metrics = {'rollup': {'count': count, 'first': first, 'last': last}}
+        crumb = Breadcrumb.from_config(
+            project, version, status=status or None, error_type=error_type or None, metrics=metrics
+        )
+        payloads[key] = crumb.to_dict()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    # the batch route is only known to be supported if batching is enabled
+    sent, kept = _post(endpoint, payloads, deadline, batching_enabled())
+    logger.debug('Sent rollup of %d outcomes', sent)
+    return sent, kept
+
+
+def _post(endpoint: str, payloads: dict, deadline: float | None, batched: bool) -> tuple[int, set]:
+    from migas.api.rest import Breadcrumb
+    from migas.request import TIMEOUT_RESPONSE, UNAVAIL_RESPONSE, _request
+    from migas.spool import retryable, spool_enabled
+
+    keys = list(payloads)
+    size = SUMMARY_BATCH_SIZE if batched else 1
+    sent = 0
+    for i in range(0, len(keys), size):
+        chunk = keys[i : i + size]
+        timeout = None if deadline is None else deadline - time.monotonic()
+        if timeout is not None and timeout <= 0:
+            return sent, set(keys[i:])
+        if batched:
+            path, json_data = Breadcrumb._batch_route, [payloads[key] for key in chunk]
+        else:
+            path, json_data = Breadcrumb._route, payloads[chunk[0]]
+        res = _request(endpoint, path=path, json_data=json_data, timeout=timeout)
+        if 200 <= res[0] < 300:
+            sent += len(chunk)
+            continue
+        if (res is TIMEOUT_RESPONSE or res is UNAVAIL_RESPONSE) and spool_enabled():
+            # the failed breadcrumbs were spooled - keep the rest for the next summary
+            return sent, set(keys[i + size :])
+        if retryable(res[0]):
+            return sent, set(keys[i:])
+        if batched:
+            # find out which outcomes of the batch are rejected
+            batch = {key: payloads[key] for key in chunk}
+            batch_sent, kept = _post(endpoint, batch, deadline, batched=False)
+            sent += batch_sent
+            if kept:
+                return sent, kept | set(keys[i + size :])
+            continue
+        logger.debug('Dropping rollup outcome rejected with status %d', res[0])
+    return sent, set()
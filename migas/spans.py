@@ -0,0 +1,115 @@
+"""Timing of named phases within a tracked process"""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable
+from functools import wraps
+from time import perf_counter_ns
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing_extensions import Self
+
+# Distinct span names kept per tracker - further names are aggregated together
+MAX_SPANS = 64
+OTHER = '<other>'
+
+
+class SpanTable:
+    """
+    Count, total and maximum duration of named spans.
+
+    At most `max_names` names are kept, and any further names are aggregated under ``<other>``,
+    so memory use stays bounded however many names are used.
+    """
+
+    __slots__ = ('_lock', '_table', 'max_names')
+
+    def __init__(self, max_names: int = MAX_SPANS):
+        self.max_names = max_names
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def reset(self) -> None:
+        self._lock = threading.Lock()
+        self._table = {}
+
+    def record(self, name: str, duration_ns: int) -> None:
+        # the hot path - kept free of further calls
+        with self._lock:
+            entry = self._table.get(name)
+            if entry is None:
+                if len(self._table) >= self.max_names:
+                    name = OTHER
+                entry = self._table.setdefault(name, [0, 0, 0])
+            entry[0] += 1
+            entry[1] += duration_ns
+            entry[2] = max(entry[2], duration_ns)
+
+    def merge(self, table: dict) -> None:
+        """Add the entries of another table, as returned by :meth:`raw`."""
+        for name, (count, total, maximum) in table.items():
+            self._add(name, count, total, maximum)
+
+    def _add(self, name: str, count: int, total: int, maximum: int) -> None:
+        with self._lock:
+            entry = self._table.get(name)
+            if entry is None:
+                if len(self._table) >= self.max_names:
+                    name = OTHER
+                entry = self._table.setdefault(name, [0, 0, 0])
+            entry[0] += count
+            entry[1] += total
+            entry[2] = max(entry[2], maximum)
+
+    def raw(self) -> dict[str, list[int]]:
+        """Return the [count, total, max] (in nanoseconds) of each name."""
+        with self._lock:
+            return {name: list(entry) for name, entry in self._table.items()}
+
+    def summary(self) -> dict[str, dict]:
+        """Return the count, total and maximum duration (in seconds) of each name."""
+        return {
+            name: {'count': count, 'total': total / 1e9, 'max': maximum / 1e9}
+            for name, (count, total, maximum) in self.raw().items()
+        }
+
+
+class Span:
+    """
+    Time a named phase, as a context manager or as a decorator.
+
+    A context manager instance is not reentrant - create one per ``with`` statement. Decorated
+    functions may be called recursively and from several threads.
+    """
+
+    __slots__ = ('_start', '_table', 'name')
+
+    def __init__(self, table: SpanTable, name: str):
+        self._table = table
+        self.name = name
+
+    def __enter__(self) -> Self:
+        self._start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self._table.record(self.name, perf_counter_ns() - self._start)
+        return False
+
+    def __call__(self, func: Callable) -> Callable:
+        table = self._table
+        name = self.name
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                table.record(name, perf_counter_ns() - start)
+
+        return timed
@@ -0,0 +1,173 @@
+"""Durable on-disk spool for breadcrumbs that could not be sent"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+
+from migas.utils import file_lock
+
+logger = logging.getLogger('migas-py')
+
+DEFAULT_SPOOL_MAX_BYTES = 1024 * 1024
+REPLAY_BATCH_SIZE = 100
+SPOOL_FILE = 'breadcrumbs.jsonl'
+
+
+def spool_enabled() -> bool:
+    """Spooling is opt-in, through the ``MIGAS_SPOOL`` environment variable."""
+    return bool(os.getenv('MIGAS_SPOOL')) and not os.getenv('MIGAS_OPTOUT')
+
+
+def _get_spool_dir() -> Path | None:
+    from migas.config import _get_config_dir
+
+    config_dir = _get_config_dir()
+    return config_dir / 'spool' if config_dir is not None else None
+
+
+def spool_failed(url: str, path: str | None, json_data: dict | list) -> None:
+    """Store breadcrumbs that failed to send, if spooling is enabled."""
+    from migas.api.rest import Breadcrumb
+
+    if not spool_enabled() or path not in (Breadcrumb._route, Breadcrumb._batch_route):
+        return
+    payloads = json_data if isinstance(json_data, list) else [json_data]
+    try:
+        append(url, payloads)
+    except OSError as e:
+        logger.debug('Could not spool breadcrumbs: %s', e)
+
+
+def append(endpoint: str, payloads: list[dict]) -> None:
+    """
+    Append breadcrumb payloads to the spool.
+
+    Once the spool exceeds ``MIGAS_SPOOL_MAX_BYTES``, it is rotated - only the current and the
+    previous spool file are kept, so older breadcrumbs are discarded first.
+    """
+    spool_dir = _get_spool_dir()
+    if spool_dir is None or not payloads:
+        return
+    records = ''.join(
+        json.dumps({'endpoint': endpoint, 'payload': payload}) + '\n' for payload in payloads
+    ).encode()
+    max_bytes = int(os.getenv('MIGAS_SPOOL_MAX_BYTES', DEFAULT_SPOOL_MAX_BYTES))
+    spool = spool_dir / SPOOL_FILE
+
+    with file_lock(spool_dir / 'spool.lock'):
+        try:
+            size = spool.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size and size + len(records) > max_bytes:
+            os.replace(spool, _rotated(spool))
+        fd = os.open(spool, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            os.write(fd, records)
+        finally:
+            os.close(fd)
+
+
+def _rotated(spool: Path) -> Path:
+    return spool.with_name(f'{spool.name}.1')
+
+
+def _claim() -> list[tuple[str, dict]]:
+    """Remove the spooled breadcrumbs from disk, and return them oldest first."""
+    spool_dir = _get_spool_dir()
+    if spool_dir is None:
+        return []
+    spool = spool_dir / SPOOL_FILE
+    records = []
+    with file_lock(spool_dir / 'spool.lock'):
+        for fname in (_rotated(spool), spool):
+            try:
+                lines = fname.read_text().splitlines()
+                fname.unlink()
+            except FileNotFoundError:
+                continue
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                    records.append((record['endpoint'], record['payload']))
+                except (ValueError, KeyError, TypeError):
+                    # partially written record
+                    continue
+    return records
+
+
+def has_spooled() -> bool:
+    spool_dir = _get_spool_dir()
+    if spool_dir is None:
+        return False
+    spool = spool_dir / SPOOL_FILE
+    return spool.exists() or _rotated(spool).exists()
+
+
+def replay(wait: bool = False) -> None:
+    """
+    Resend spooled breadcrumbs in bulk.
+
+    Unless `wait` is enabled, this is done by the background sender.
+    """
+    if not spool_enabled() or not has_spooled():
+        return
+    if wait:
+        _replay()
+        return
+
+    from migas.request import _sender
+
+    _sender.submit(_replay)
+
+
+def retryable(status: int) -> bool:
+    """Whether a request that failed with `status` may succeed if sent again later."""
+    return status >= 500 or status in (408, 429)
+
+
+def _replay() -> None:
+    from migas.batch import batching_enabled
+
+    batches = {}
+    for endpoint, payload in _claim():
+        batches.setdefault(endpoint, []).append(payload)
+    # the batch route is only known to be supported if batching is enabled
+    batched = batching_enabled()
+    for endpoint, payloads in batches.items():
+        if kept := _resend(endpoint, payloads, batched):
+            append(endpoint, kept)
+
+
+def _resend(endpoint: str, payloads: list[dict], batched: bool) -> list[dict]:
+    """
+    Send spooled breadcrumbs. Returns those to keep for later, once the server fails to accept
+    them - breadcrumbs that are rejected for good (a 4xx response) are dropped instead.
+    """
+    from migas.api.rest import Breadcrumb
+    from migas.request import TIMEOUT_RESPONSE, UNAVAIL_RESPONSE, _request
+
+    size = REPLAY_BATCH_SIZE if batched else 1
+    for i in range(0, len(payloads), size):
+        chunk = payloads[i : i + size]
+        if batched:
+            res = _request(endpoint, path=Breadcrumb._batch_route, json_data=chunk)
+        else:
+            res = _request(endpoint, path=Breadcrumb._route, json_data=chunk[0])
+        if 200 <= res[0] < 300:
+            continue
+        if res is TIMEOUT_RESPONSE or res is UNAVAIL_RESPONSE:
+            # still offline - the failed chunk was spooled again, keep the rest for later
+            return payloads[i + size :]
+        if retryable(res[0]):
+            return payloads[i:]
+        if batched:
+            # find out which breadcrumbs of the batch are rejected
+            if kept := _resend(endpoint, chunk, batched=False):
+                return kept + payloads[i + size :]
+            continue
+        logger.debug('Dropping spooled breadcrumb rejected with status %d', res[0])
+    return []
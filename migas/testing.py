@@ -0,0 +1,306 @@
+"""
+A local stand-in for the migas server, for tests and benchmarks.
+
+The server only depends on the standard library, and runs in a background thread::
+
+    from migas.testing import MigasServer
+
+    with MigasServer(latency=0.05, error_rate=0.1) as server:
+        migas.setup(endpoint=server.url)
+        migas.add_breadcrumb('nipreps/migas-py', '0.0.1', wait=True)
+    assert len(server.breadcrumbs) == 1
+
+Breadcrumbs are accepted on ``/api/breadcrumb`` (and, with ``batch_route=True``, on
+``/api/breadcrumbs`` in batches), and the ``check_project`` and ``get_usage`` queries sent by this
+client are answered on ``/graphql``.
+Latency, errors, compressed responses and dropped connections can be injected to exercise
+connection pooling, retries and timeouts without a network.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from typing_extensions import Self
+
+BREADCRUMB_ROUTE = '/api/breadcrumb'
+BATCH_ROUTE = '/api/breadcrumbs'
+GRAPHQL_ROUTE = '/graphql'
+
+# Fields of a query, with their alias, arguments and selection
+_FIELD = re.compile(r'(?:(\w+):)?(\w+)\(([^)]*)\)(?:\{([^}]*)\})?')
+_ARG = re.compile(r'(\w+):("(?:[^"\\]|\\.)*"|[^,\s]+)')
+
+
+class MigasServer(ThreadingHTTPServer):
+    """
+    An in-process migas server, listening on `host` (by default, on a free port).
+
+    Parameters
+    ----------
+    latency : float
+        Seconds to wait before answering each request
+    error_rate : float
+        Fraction of requests answered with `error_status`
+    error_status : int
+        Status code of injected errors
+    drop_rate : float
+        Fraction of requests whose connection is closed without a response
+    keep_alive : bool
+        Whether connections are kept open between requests
+    response_encoding : str, optional
+        Compress responses with ``gzip`` or ``deflate``, if the client accepts it
+    accept_encoding : str, optional
+        Encodings of request bodies advertised in the ``Accept-Encoding`` response header
+    reject_gzip : bool
+        Answer gzip-compressed requests with 415 (Unsupported Media Type)
+    batch_route : bool
+        Accept batches of breadcrumbs on ``/api/breadcrumbs``, which servers must opt in to -
+        otherwise, they are answered with 404, as by a stock server
+    latest : dict
+        Latest version of each project, as reported by ``check_project``
+    flagged : set
+        (project, version) pairs reported as flagged by ``check_project``
+    seed : int, optional
+        Seed of the injected errors and drops
+
+    All parameters can also be changed while the server is running. Received requests are
+    recorded in `received`, as (path, data) pairs, and the breadcrumbs accepted singly or in
+    batches in `breadcrumbs`.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        *,
+        latency: float = 0,
+        error_rate: float = 0,
+        error_status: int = 503,
+        drop_rate: float = 0,
+        keep_alive: bool = True,
+        response_encoding: str | None = None,
+        accept_encoding: str | None = None,
+        reject_gzip: bool = False,
+        batch_route: bool = False,
+        latest: dict[str, str] | None = None,
+        flagged: set[tuple[str, str]] | None = None,
+        seed: int | None = None,
+    ):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drop_rate = drop_rate
+        self.keep_alive = keep_alive
+        self.response_encoding = response_encoding
+        self.accept_encoding = accept_encoding
+        self.reject_gzip = reject_gzip
+        self.batch_route = batch_route
+        self.latest = latest if latest is not None else {}
+        self.flagged = flagged if flagged is not None else set()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.reset()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def reset(self) -> None:
+        """Forget the requests received so far."""
+        with self._lock:
+            self.connections = 0
+            self.requests = 0
+            self.errors = 0
+            self.drops = 0
+            self.received = []
+            self.breadcrumbs = []
+            self.encodings = []
+
+    def start(self) -> Self:
+        """Serve requests from a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self.serve_forever, args=(0.05,), name='migas-test-server', daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self) -> Self:
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def handle_error(self, request, client_address) -> None:
+        import sys
+
+        # clients that time out go away before the response is sent
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def _inject(self) -> str | None:
+        """Return the fault to inject in the next response, if any."""
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+            if roll < self.drop_rate:
+                self.drops += 1
+                return 'drop'
+            if roll < self.drop_rate + self.error_rate:
+                self.errors += 1
+                return 'error'
+        return None
+
+    def _graphql(self, operation: dict) -> dict:
+        query = operation.get('query') or ''
+        variables = operation.get('variables') or {}
+        # skip the operation name and variable declarations
+        body = query[query.find('{') + 1 : query.rfind('}')]
+        data = {}
+        for alias, name, arguments, selection in _FIELD.findall(body):
+            args = {arg: _value(value, variables) for arg, value in _ARG.findall(arguments)}
+            if (resolver := getattr(self, f'_resolve_{name}', None)) is None:
+                return {'data': None, 'errors': [{'message': f'Unknown field: {name}'}]}
+            result = resolver(**args)
+            if selection:
+                result = {k: result.get(k) for k in selection.split(',')}
+            data[alias or name] = result
+        return {'data': data}
+
+    def _resolve_check_project(self, project=None, project_version=None, **kwargs) -> dict:
+        return {
+            'success': True,
+            'flagged': (project, project_version) in self.flagged,
+            'latest': self.latest.get(project, project_version),
+            'message': '',
+        }
+
+    def _resolve_get_usage(self, project=None, unique=False, **kwargs) -> dict:
+        crumbs = [c for c in self.breadcrumbs if c.get('project') == project]
+        users = {(c.get('ctx') or {}).get('user_id') for c in crumbs}
+        return {
+            'success': True,
+            'hits': len(users) if unique else len(crumbs),
+            'unique': len(users),
+            'message': '',
+        }
+
+
+def _value(value: str, variables: dict):
+    if value.startswith('$'):
+        return variables.get(value[1:])
+    if value.startswith('"'):
+        return json.loads(value)
+    if value in ('true', 'false'):
+        return value == 'true'
+    try:
+        return int(value)
+    except ValueError:
+        # enum values
+        return value
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately - do not hold back the body
+    disable_nagle_algorithm = True
+    server: MigasServer
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        if (fault := self.server._inject()) is None:
+            self._respond({'success': True})
+        else:
+            self._fail(fault)
+
+    def do_POST(self):
+        import gzip
+
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if (fault := self.server._inject()) is not None:
+            self._fail(fault)
+            return
+        encoding = self.headers.get('Content-Encoding')
+        self.server.encodings.append(encoding)
+        if encoding == 'gzip':
+            if self.server.reject_gzip:
+                self._respond({'success': False}, status=415)
+                return
+            body = gzip.decompress(body)
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            self._respond({'detail': 'Invalid JSON'}, status=400)
+            return
+        self.server.received.append((self.path, data))
+
+        path = urlsplit(self.path).path.rstrip('/')
+        if path == BREADCRUMB_ROUTE or (path == BATCH_ROUTE and self.server.batch_route):
+            self.server.breadcrumbs.extend(data if isinstance(data, list) else [data])
+            self._respond({'success': True})
+        elif path == GRAPHQL_ROUTE and isinstance(data, dict):
+            self._respond(self.server._graphql(data))
+        elif not path:
+            self._respond({'success': True})
+        else:
+            self._respond({'detail': 'Not Found'}, status=404)
+
+    def _fail(self, fault: str) -> None:
+        if fault == 'drop':
+            # close the connection without responding
+            self.close_connection = True
+        else:
+            self._respond({'detail': 'Injected error'}, status=self.server.error_status)
+
+    def _respond(self, data: dict, status: int = 200):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = json.dumps(data).encode()
+        encoding = self.server.response_encoding
+        if encoding and encoding in self.headers.get('Accept-Encoding', ''):
+            import gzip
+            import zlib
+
+            body = gzip.compress(body) if encoding == 'gzip' else zlib.compress(body)
+        else:
+            encoding = None
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Backend-Server', 'migas')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        if self.server.accept_encoding:
+            self.send_header('Accept-Encoding', self.server.accept_encoding)
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = not self.server.keep_alive
+
+    def log_message(self, *args):
+        pass
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
 import atexit
+import json
 import logging
+import os
 import signal
+import sys
 import threading
+import time
 from contextlib import ContextDecorator
 from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Any
 
 from migas.error import (
@@ -14,12 +19,34 @@ from migas.error import (
     status_from_exception,
     status_from_signal,
 )
+from migas.spans import Span, SpanTable
 
 logger = logging.getLogger('migas-py')
 
 # Module-level registry for idempotency
 _active_trackers: dict[str, Tracker] = {}
 
+DEFAULT_EXIT_BUDGET_MS = 3000
+# Deadline (monotonic) shared by the final breadcrumbs sent while the process exits
+_exit_deadline: float | None = None
+# Time spent sending final breadcrumbs on exit, and how many were sent or deferred to the spool
+_exit_stats = {'spent': 0.0, 'sent': 0, 'deferred': 0}
+
+
+def _get_exit_deadline() -> float:
+    """Return the exit deadline, starting the ``MIGAS_EXIT_BUDGET_MS`` budget on first use."""
+    global _exit_deadline
+
+    if _exit_deadline is None:
+        budget = float(os.getenv('MIGAS_EXIT_BUDGET_MS') or DEFAULT_EXIT_BUDGET_MS) / 1000
+        _exit_deadline = time.monotonic() + budget
+    return _exit_deadline
+
+
+def _exit_timeout() -> float:
+    """Return the seconds left in the exit budget, starting it on first use."""
+    return max(_get_exit_deadline() - time.monotonic(), 0)
+
 
 @dataclass
 class Tracker(ContextDecorator):
@@ -29,11 +56,19 @@ class Tracker(ContextDecorator):
     signals: tuple[signal.Signals, ...] = (signal.SIGINT, signal.SIGTERM)
     init_ping: bool = True
     crumb_kwargs: dict = field(default_factory=dict)
+    resources: bool = False
+    heartbeat: bool = False
 
     # Propagate existing handlers
     _previous_handlers: dict[int, Any] = field(default_factory=dict, repr=False)
     _started: bool = field(default=False, init=False, repr=False)
     _stopped: bool = field(default=False, repr=False)
+    # Registry key of the process that started the tracker, if this is a forked worker
+    _owner: str | None = field(default=None, init=False, repr=False)
+    # Monotonic time and resource usage when the tracker was started
+    _start_time: float | None = field(default=None, init=False, repr=False)
+    _start_usage: tuple[float, float] | None = field(default=None, init=False, repr=False)
+    _spans: SpanTable = field(default_factory=SpanTable, init=False, repr=False)
 
     def __post_init__(self):
         self.error_handlers = resolve_error_handlers(self.error_handlers)
@@ -44,18 +79,40 @@ class Tracker(ContextDecorator):
         """Send the initial breadcrumb and register tracker to avoid repeats."""
         if self._started or self._stopped:
             return
+        if self.resources:
+            self._start_time = time.monotonic()
+            self._start_usage = _cpu_times()
 
-        from migas.api import add_breadcrumb
+        # Skip importing the API entirely if telemetry is disabled
+        if self.init_ping and not os.getenv('MIGAS_OPTOUT'):
+            from migas.api import add_breadcrumb
 
-        if self.init_ping:
             add_breadcrumb(
                 self.project, self.version, status='R', status_desc='Started', **self.crumb_kwargs
             )
+            # Sending may have registered exit handlers flushing queued breadcrumbs, which would
+            # run first - register again so the final breadcrumb is sent before them
+            atexit.unregister(self._on_exit)
+            atexit.register(self._on_exit)
+
+        if self.heartbeat and not os.getenv('MIGAS_OPTOUT'):
+            from migas.heartbeat import get_scheduler
+
+            get_scheduler().add(self)
 
         key = f'{self.project}@{self.version}'
         _active_trackers[key] = self
         self._started = True
 
+    def span(self, name: str) -> Span:
+        """
+        Time a named phase of the process, as a context manager or decorator.
+
+        The number of times each phase ran, and its total and maximum durations, are reported
+        in the final breadcrumb.
+        """
+        return Span(self._spans, name)
+
     def _install_atexit(self):
         atexit.register(self._on_exit)
 
@@ -76,13 +133,13 @@ class Tracker(ContextDecorator):
         if self._stopped:
             return
         status_kwargs = inspect_error(self.error_handlers)
-        self._send_final(**self.crumb_kwargs, **status_kwargs)
+        self._send_final(exiting=True, **self.crumb_kwargs, **status_kwargs)
 
     def _on_signal(self, signum, frame):
         """Signal handler — synthesizes status from signal number."""
         if not self._stopped:
             status_kwargs = status_from_signal(signum)
-            self._send_final(**self.crumb_kwargs, **status_kwargs)
+            self._send_final(exiting=True, **self.crumb_kwargs, **status_kwargs)
 
         # Chain to previous handler
         prev = self._previous_handlers.get(signum, signal.SIG_DFL)
@@ -93,16 +150,161 @@ class Tracker(ContextDecorator):
             signal.signal(signum, signal.SIG_DFL)
             signal.raise_signal(signum)
 
-    def _send_final(self, **kwargs):
-        """Send the final breadcrumb synchronously."""
+    def _send_final(self, exiting: bool = False, **kwargs):
+        """
+        Send the final breadcrumb synchronously.
+
+        While `exiting`, all trackers share a single time budget. Breadcrumbs that do not fit in
+        it are spooled instead of sent (if ``MIGAS_SPOOL`` is enabled).
+
+        Forked workers only record their outcome, which is summarized in the final breadcrumb of
+        the process that started the tracker.
+        """
         self._stopped = True
+        if self.heartbeat and self._owner is None:
+            from migas.heartbeat import get_scheduler
+
+            get_scheduler().remove(self)
+        if os.getenv('MIGAS_OPTOUT'):
+            return
+        if self._owner is not None:
+            self._record_worker(kwargs)
+            return
         from migas.api.rest import Breadcrumb
         from migas.config import Config
-        from migas.request import _request
+        from migas.ratelimit import admit
+        from migas.rollup import record
 
+        metrics = {}
+        if workers := self._collect_workers():
+            metrics['workers'] = workers
+        if self.resources:
+            metrics['resources'] = self._resource_usage(workers['count'] if workers else 0)
+        if self._spans:
+            metrics['spans'] = self._spans.summary()
+        if metrics:
+            kwargs['metrics'] = {**(kwargs.get('metrics') or {}), **metrics}
         payload = Breadcrumb.from_config(self.project, self.version, **kwargs).to_dict()
-        # Use _request directly — no ThreadPoolExecutor during shutdown
-        _request(Config.endpoint, path=Breadcrumb._route, json_data=payload)
+        # within the exit budget, if the rollup is sent along
+        timeout = _exit_timeout() if exiting else None
+        if record(Config.endpoint, payload, timeout=timeout) or not admit(
+            Config.endpoint, payload
+        ):
+            return
+        if not exiting:
+            self._deliver(payload)
+            return
+
+        start = time.monotonic()
+        sent = self._deliver(payload, deadline=_get_exit_deadline())
+        spent = time.monotonic() - start
+        _exit_stats['spent'] += spent
+        _exit_stats['sent' if sent else 'deferred'] += 1
+        logger.debug(
+            'Final breadcrumb %s after %.0f ms (%.0f ms spent on exit)',
+            'sent' if sent else 'deferred',
+            spent * 1000,
+            _exit_stats['spent'] * 1000,
+        )
+
+    def _resource_usage(self, workers: int) -> dict:
+        """
+        Summarize the resources used since the tracker was started.
+
+        CPU times include terminated child processes that were waited for. Peak RSS is that of
+        this process, or of its largest child, in KiB.
+        """
+        usage = {'workers': workers}
+        if self._start_time is not None:
+            usage['wall'] = round(time.monotonic() - self._start_time, 3)
+        try:
+            import resource
+        except ImportError:
+            return usage
+
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        start_user, start_system = self._start_usage or (0.0, 0.0)
+        usage['user'] = round(own.ru_utime + children.ru_utime - start_user, 3)
+        usage['system'] = round(own.ru_stime + children.ru_stime - start_system, 3)
+        max_rss = max(own.ru_maxrss, children.ru_maxrss)
+        # reported in bytes on macOS, and in KiB elsewhere
+        usage['max_rss'] = max_rss // 1024 if sys.platform == 'darwin' else max_rss
+        return usage
+
+    def _record_worker(self, status_kwargs: dict) -> None:
+        """Append the outcome of this worker process to the file shared with its owner."""
+        if (workers_file := _get_workers_file(self._owner, self)) is None:
+            return
+        record = {k: status_kwargs.get(k) for k in ('status', 'error_type')}
+        if self._spans:
+            record['spans'] = self._spans.raw()
+        line = json.dumps({'pid': os.getpid(), **record}) + '\n'
+        try:
+            workers_file.parent.mkdir(mode=0o700, exist_ok=True)
+            # a single small O_APPEND write is not interleaved with those of other workers
+            fd = os.open(workers_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.debug('Could not record worker outcome: %s', e)
+
+    def _collect_workers(self) -> dict | None:
+        """Summarize the outcomes recorded by forked workers, if any."""
+        from migas.registry import process_key
+
+        if (owner := process_key(os.getpid())) is None:
+            return None
+        if (workers_file := _get_workers_file(owner, self)) is None:
+            return None
+        _remove_orphaned_workers_files(workers_file.parent)
+        try:
+            lines = workers_file.read_text().splitlines()
+            workers_file.unlink()
+        except OSError:
+            return None
+
+        summary = {'count': 0, 'status': {}, 'error_type': {}}
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            summary['count'] += 1
+            if isinstance(spans := record.get('spans'), dict):
+                self._spans.merge(spans)
+            for key in ('status', 'error_type'):
+                if (value := record.get(key)) is not None:
+                    summary[key][value] = summary[key].get(value, 0) + 1
+        return summary if summary['count'] else None
+
+    def _deliver(self, payload: dict, deadline: float | None = None) -> bool:
+        """Send a final breadcrumb. Returns `False` if it was deferred for lack of time."""
+        from migas.api.rest import Breadcrumb
+        from migas.batch import get_batcher
+        from migas.config import Config
+        from migas.request import DEFAULT_TIMEOUT, _request, flush
+        from migas.spool import spool_failed
+
+        def remaining() -> float | None:
+            return None if deadline is None else deadline - time.monotonic()
+
+        if (batcher := get_batcher()) is not None:
+            # Send the final breadcrumb along with any breadcrumbs still waiting in the batch -
+            # on exit, start pings and final breadcrumbs go first
+            batcher.add(Config.endpoint, payload)
+            return batcher.flush(timeout=remaining())
+        # Drain queued breadcrumbs (i.e. the start ping) so the final one arrives last. On exit,
+        # this is bounded by the budget - if it runs out, the final breadcrumb is spooled instead
+        flush(timeout=DEFAULT_TIMEOUT if deadline is None else max(remaining(), 0))
+        if (timeout := remaining()) is not None and timeout <= 0:
+            spool_failed(Config.endpoint, Breadcrumb._route, payload)
+            return False
+        # Use _request directly — the background sender may not outlive the interpreter
+        _request(Config.endpoint, path=Breadcrumb._route, json_data=payload, timeout=timeout)
+        return True
 
     def stop(self, exc: BaseException | None = None):
         """Manually send final breadcrumb and deregister. Idempotent."""
@@ -134,18 +336,99 @@ class Tracker(ContextDecorator):
         return False
 
 
+def _cpu_times() -> tuple[float, float] | None:
+    """Return the user and system CPU time used by this process and its children so far."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + children.ru_utime, own.ru_stime + children.ru_stime
+
+
+def _get_workers_file(owner: str, tracker: Tracker) -> Path | None:
+    from migas.utils import get_runtime_dir
+
+    if (runtime_dir := get_runtime_dir()) is None:
+        return None
+    # the tracker object keeps its address in forked children
+    return runtime_dir / 'workers' / f'{owner}-{id(tracker):x}.jsonl'
+
+
+def _remove_orphaned_workers_files(workers_dir: Path) -> None:
+    """Remove the outcomes recorded for owners that exited without collecting them."""
+    from migas.registry import _is_running
+
+    try:
+        for workers_file in workers_dir.iterdir():
+            if not _is_running(workers_file.name.split('-')[0]):
+                workers_file.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+def _after_fork_in_child() -> None:
+    """
+    Turn the trackers inherited by a forked child into worker trackers.
+
+    Workers record their outcome on exit instead of sending a final breadcrumb. Children of
+    :mod:`multiprocessing` exit without running :mod:`atexit` handlers, so a finalizer is
+    registered there as well.
+    """
+    global _exit_deadline, _exit_stats
+
+    _exit_deadline = None
+    _exit_stats = {'spent': 0.0, 'sent': 0, 'deferred': 0}
+    trackers = [t for t in _active_trackers.values() if not t._stopped]
+    if not trackers:
+        return
+
+    from migas.registry import process_key
+
+    owner = process_key(os.getppid())
+    mp_util = sys.modules.get('multiprocessing.util')
+    for tracker in trackers:
+        if tracker._owner is None:
+            tracker._owner = owner
+        # spans are counted by the process that ran them
+        tracker._spans.reset()
+        if tracker._owner is None:
+            # the owner is already gone
+            tracker._stopped = True
+            continue
+        if mp_util is not None:
+            # multiprocessing clears finalizers after forking, then runs these callbacks
+            mp_util.register_after_fork(tracker, _register_worker_finalizer)
+
+
+def _register_worker_finalizer(tracker: Tracker) -> None:
+    from multiprocessing.util import Finalize
+
+    Finalize(tracker, tracker._on_exit, exitpriority=0)
+
+
 def track(
     project: str,
     version: str,
     error_handlers: str | dict | list | None = None,
     signals: tuple[signal.Signals, ...] = (signal.SIGINT, signal.SIGTERM),
     init_ping: bool = True,
+    resources: bool = False,
+    heartbeat: bool = False,
     **kwargs,
 ) -> Tracker:
     """
     Begin tracking a process. Returns a Tracker that works as a context manager,
     decorator, or standalone (atexit + signal handlers).
 
+    If `resources` is enabled, the final breadcrumb includes the wall-clock time, CPU time and
+    peak memory used since tracking began.
+
+    If `heartbeat` is enabled, "Heartbeat" breadcrumbs are sent periodically while the process
+    runs, at growing intervals, so that processes that die without a final breadcrumb can be
+    told apart from those still running.
+
     If a tracker for the specified project and version is already active, that
     instance is returned.
     """
@@ -160,6 +443,8 @@ def track(
         signals=signals,
         init_ping=init_ping,
         crumb_kwargs=kwargs,
+        resources=resources,
+        heartbeat=heartbeat,
     )
     tracker.start()
     return tracker
@@ -188,3 +473,7 @@ def track_exit(
         )
         error_handlers = kwargs.pop('error_funcs')
     track(project, version, error_handlers, **kwargs)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
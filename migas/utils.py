@@ -1,7 +1,11 @@
 """Utility functions"""
 
+import json
+import os
 import platform
 import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
 from pathlib import Path
 
 
@@ -24,9 +28,135 @@ def get_platform_info() -> dict:
 
 
 def compile_info() -> dict:
+    """
+    Collect platform, container and CI information.
+
+    The probed information is cached per host, and reused by later processes of the same boot
+    and interpreter.
+    """
+    cache = read_host_cache()
+    if isinstance(info := cache.get('info'), dict):
+        return info
+
     from ci_info import is_ci
 
     data = get_platform_info()
     data['container'] = is_container()
     data['is_ci'] = is_ci()
+    update_host_cache(info=data)
     return data
+
+
+def get_runtime_dir() -> Path | None:
+    """
+    Return the per-user directory for host-local state, or None if unavailable.
+
+    The directory is created in the temporary directory, unless ``MIGAS_RUNTIME_DIR`` is set.
+    """
+    base = os.getenv('MIGAS_RUNTIME_DIR') or _tempdir()
+    uid = os.getuid() if hasattr(os, 'getuid') else None
+    path = Path(base) / (f'migas-{uid}' if uid is not None else 'migas')
+    try:
+        path.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # do not trust a directory created by someone else
+        if uid is not None and path.stat().st_uid != uid:
+            return None
+    except OSError:
+        return None
+    return path
+
+
+def _tempdir() -> str:
+    """
+    Return the temporary directory.
+
+    This mirrors the lookup of :func:`tempfile.gettempdir`, without importing :mod:`tempfile` or
+    probing each candidate directory by writing to it.
+    """
+    for envvar in ('TMPDIR', 'TEMP', 'TMP'):
+        if dirname := os.getenv(envvar):
+            return dirname
+    if os.name == 'posix' and os.path.isdir('/tmp'):
+        return '/tmp'
+    from tempfile import gettempdir
+
+    return gettempdir()
+
+
+HOST_CACHE_FILE = 'host.json'
+
+
+def _host_cache_key() -> str | None:
+    """
+    Return the validity key of the host cache, or None if the cache should not be used.
+
+    The key changes on reboot (Linux boot id), with the interpreter, and with the names of the
+    environment variables, which CI detection relies on.
+    """
+    import zlib
+
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as f:
+            boot_id = f.read().strip()
+    except OSError:
+        return None
+    env = zlib.crc32('\0'.join(sorted(os.environ)).encode())
+    return f'{boot_id}:{sys.executable}:{env:08x}'
+
+
+def read_host_cache() -> dict:
+    """Return the cached host information, or an empty dictionary if missing or stale."""
+    key = _host_cache_key()
+    runtime_dir = get_runtime_dir()
+    if key is None or runtime_dir is None:
+        return {}
+    try:
+        cache = json.loads((runtime_dir / HOST_CACHE_FILE).read_text())
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('key') != key:
+        return {}
+    return cache
+
+
+def update_host_cache(**entries) -> None:
+    """Add `entries` to the host cache."""
+    key = _host_cache_key()
+    runtime_dir = get_runtime_dir()
+    if key is None or runtime_dir is None:
+        return
+    cache = {**read_host_cache(), **entries, 'key': key}
+    target = runtime_dir / HOST_CACHE_FILE
+    tmp = target.with_name(f'{target.name}.{os.getpid()}')
+    try:
+        tmp.write_text(json.dumps(cache))
+        os.replace(tmp, target)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+
+
+@contextmanager
+def file_lock(path: str | Path, blocking: bool = True) -> Iterator[bool]:
+    """
+    Hold an exclusive advisory lock on `path`, shared between processes on the same host.
+
+    Unless `blocking`, the lock is not waited for: the context manager yields whether it was
+    acquired. Locking is skipped on platforms without :mod:`fcntl`.
+    """
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        acquired = True
+        try:
+            import fcntl
+        except ImportError:
+            pass
+        else:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                acquired = False
+        yield acquired
+    finally:
+        # closing the descriptor releases the lock
+        os.close(fd)
@@ -1,13 +1,24 @@
-import pytest
 from collections import namedtuple
 from unittest.mock import MagicMock
+
+import pytest
+
 import migas
+from migas.testing import MigasServer
 from migas.tracker import _active_trackers
 
 TEST_ROOT = 'http://localhost:8080/'
 Mocks = namedtuple('Mocks', ['add_breadcrumb', 'request'])
 
 
+@pytest.fixture(autouse=True)
+def runtime_dir(monkeypatch, tmp_path):
+    """Keep host-local state (caches, locks) of each test separate."""
+    monkeypatch.setenv('MIGAS_RUNTIME_DIR', str(tmp_path / 'runtime'))
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    return tmp_path / 'runtime'
+
+
 @pytest.fixture(scope='session')
 def endpoint() -> str:
     """Assume tests are run with a local server - revisit if this changes"""
@@ -25,9 +36,22 @@ def setup_migas(endpoint):
 @pytest.fixture
 def mock_requests(monkeypatch):
     mock_add = MagicMock()
-    mock_req = MagicMock()
+    mock_req = MagicMock(return_value=(200, {'success': True}))
     monkeypatch.setattr('migas.api.add_breadcrumb', mock_add)
     monkeypatch.setattr('migas.request._request', mock_req)
+    monkeypatch.setattr('migas.tracker._exit_deadline', None)
+    monkeypatch.setattr('migas.tracker._exit_stats', {'spent': 0.0, 'sent': 0, 'deferred': 0})
     _active_trackers.clear()
     yield Mocks(mock_add, mock_req)
     _active_trackers.clear()
+
+
+@pytest.fixture
+def local_server():
+    """Local stand-in migas server, counting connections and recording POSTed data."""
+    migas.request._pool.clear()
+    migas.request._compression.clear()
+    with MigasServer() as server:
+        yield server
+    migas.request._pool.clear()
+    migas.request._compression.clear()
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from migas import aio
+from migas.config import Config
+
+pytestmark = pytest.mark.filterwarnings('ignore')
+
+
+@pytest.fixture
+def aio_server(local_server, monkeypatch):
+    monkeypatch.setattr(Config, 'endpoint', f'http://127.0.0.1:{local_server.server_port}')
+    monkeypatch.setattr(Config, '_is_setup', True)
+    return local_server
+
+
+def test_aio_add_breadcrumb(aio_server):
+    async def main():
+        for i in range(5):
+            assert await aio.add_breadcrumb('nipreps/migas-py', f'0.0.{i}') is None
+        await aio.flush()
+        res = await aio.add_breadcrumb('nipreps/migas-py', '1.0.0', wait=True)
+        await aio.aclose()
+        return res
+
+    assert asyncio.run(main()) == {'success': True}
+    paths = [path for path, _ in aio_server.received]
+    assert paths[:5] == ['/api/breadcrumb'] * 5
+    assert paths[5] == '/api/breadcrumb?wait=true'
+    versions = sorted(data['project_version'] for _, data in aio_server.received)
+    assert versions == ['0.0.0', '0.0.1', '0.0.2', '0.0.3', '0.0.4', '1.0.0']
+
+
+def test_aio_shared_connections(aio_server, monkeypatch):
+    monkeypatch.setenv('MIGAS_AIO_MAX_CONNECTIONS', '2')
+
+    async def main():
+        await asyncio.gather(
+            *(aio.add_breadcrumb('nipreps/migas-py', '0.0.1', wait=True) for _ in range(20))
+        )
+        await aio.aclose()
+
+    asyncio.run(main())
+    assert len(aio_server.received) == 20
+    assert aio_server.connections <= 2
+
+
+def test_aio_reconnect(aio_server):
+    aio_server.keep_alive = False
+
+    async def main():
+        for _ in range(3):
+            await aio.add_breadcrumb('nipreps/migas-py', '0.0.1', wait=True)
+        await aio.aclose()
+
+    asyncio.run(main())
+    assert len(aio_server.received) == 3
+    assert aio_server.connections == 3
+
+
+def test_aio_queries(aio_server):
+    async def main():
+        res = await asyncio.gather(
+            aio.check_project('nipreps/migas-py', '0.0.1'),
+            aio.get_usage('nipreps/migas-py', '2022-07-01'),
+        )
+        await aio.aclose()
+        return res
+
+    check, usage = asyncio.run(main())
+    assert check == {'success': True, 'flagged': False, 'latest': '0.0.1', 'message': ''}
+    assert usage == {'success': True, 'hits': 0, 'unique': 0, 'message': ''}
+    assert [path for path, _ in aio_server.received] == ['/graphql', '/graphql']
+    (check_query,) = [data for _, data in aio_server.received if 'check_project' in data['query']]
+    assert check_query['variables']['project'] == 'nipreps/migas-py'
+
+
+def test_aio_locked_files_off_loop(aio_server, monkeypatch):
+    """The breaker and cache take blocking file locks, so they are not used on the event loop."""
+    import threading
+
+    from migas import breaker, cache
+
+    threads = []
+
+    def watch(func):
+        def wrapper(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    monkeypatch.setattr(breaker, 'allow', watch(breaker.allow))
+    monkeypatch.setattr(breaker, 'record', watch(breaker.record))
+    monkeypatch.setattr(aio, 'lookup', watch(cache.lookup))
+    monkeypatch.setattr(aio, 'store', watch(cache.store))
+
+    async def main():
+        await aio.check_project('nipreps/migas-py', '0.0.1')
+        await aio.aclose()
+
+    asyncio.run(main())
+    assert len(threads) == 4
+    assert threading.main_thread() not in threads
+
+
+def test_aio_unavailable(monkeypatch):
+    monkeypatch.setattr(Config, 'endpoint', 'http://127.0.0.1:1')
+    monkeypatch.setattr(Config, '_is_setup', True)
+    res = asyncio.run(aio.check_project('nipreps/migas-py', '0.0.1'))
+    assert res['success'] is False
+    assert res['message'] == 'Could not connect to server.'
+
+
+def test_aio_optout(monkeypatch):
+    monkeypatch.setenv('MIGAS_OPTOUT', '1')
+    res = asyncio.run(aio.add_breadcrumb('nipreps/migas-py', '0.0.1'))
+    assert res['success'] is False
@@ -0,0 +1,147 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from migas import batch
+from migas.batch import BreadcrumbBatcher
+
+ENDPOINT = 'http://localhost:8080/'
+
+
+def crumb(status: str | None = None, n: int = 0) -> dict:
+    payload = {'project': 'nipreps/migas-py', 'project_version': str(n)}
+    if status:
+        payload['proc'] = {'status': status}
+    return payload
+
+
+@pytest.fixture
+def mock_request(monkeypatch):
+    mock_req = MagicMock(return_value=(200, {'success': True}))
+    monkeypatch.setattr('migas.request._request', mock_req)
+    return mock_req
+
+
+def sent(mock_req) -> list:
+    return [c[1]['json_data'] for c in mock_req.call_args_list]
+
+
+def test_batch_flush_size(mock_request):
+    batcher = BreadcrumbBatcher(size=2, max_age=60)
+    batcher.add(ENDPOINT, crumb('R', 0))
+    batcher.add(ENDPOINT, crumb('C', 1))
+    deadline = time.monotonic() + 5
+    while not mock_request.called and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert mock_request.call_count == 1
+    assert mock_request.call_args[0][0] == ENDPOINT
+    assert mock_request.call_args[1]['path'] == '/api/breadcrumbs'
+    assert sent(mock_request) == [[crumb('R', 0), crumb('C', 1)]]
+
+
+def test_batch_flush_age(mock_request):
+    batcher = BreadcrumbBatcher(size=100, max_age=0.05)
+    batcher.add(ENDPOINT, crumb('R'))
+    assert not mock_request.called
+    deadline = time.monotonic() + 5
+    while not mock_request.called and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sent(mock_request) == [[crumb('R')]]
+
+
+def test_batch_priority(mock_request):
+    batcher = BreadcrumbBatcher(size=100, max_age=60, maxsize=3)
+    assert batcher.add(ENDPOINT, crumb('R', 0))
+    assert batcher.add(ENDPOINT, crumb('F', 1))
+    assert batcher.add(ENDPOINT, crumb('R', 2))
+    # start pings are dropped first, oldest first
+    assert batcher.add(ENDPOINT, crumb('C', 3))
+    assert batcher.add(ENDPOINT, crumb('S', 4))
+    # only final breadcrumbs remain, so new breadcrumbs are dropped
+    assert not batcher.add(ENDPOINT, crumb('R', 5))
+    assert not batcher.add(ENDPOINT, crumb('F', 6))
+    assert batcher.dropped == 4
+
+    batcher.flush()
+    # order of arrival is preserved
+    assert sent(mock_request) == [[crumb('F', 1), crumb('C', 3), crumb('S', 4)]]
+
+
+def test_batch_finals_first(mock_request):
+    batcher = BreadcrumbBatcher(size=2, max_age=60)
+    with batcher._cond:
+        # hold the worker off while queueing
+        batcher._ensure_started()
+        for i, status in enumerate(['', 'R', 'C', 'F']):
+            item = (i, 0, ENDPOINT, crumb(status, i))
+            (batcher._final if status in batch.FINAL_STATUSES else batcher._other).append(item)
+    # with a deadline, final breadcrumbs are sent first - after the start pings preceding them
+    assert batcher.flush(timeout=5)
+    assert sent(mock_request) == [[crumb('R', 1), crumb('C', 2)], [crumb('F', 3), crumb(None, 0)]]
+
+
+def test_batch_single_route(mock_request, monkeypatch):
+    spooled = MagicMock()
+    monkeypatch.setattr('migas.spool.spool_failed', spooled)
+    mock_request.side_effect = [(200, {}), (404, {})]
+    batcher = BreadcrumbBatcher(size=10, max_age=60, batch_route=False)
+    with batcher._cond:
+        # hold the worker off while queueing
+        batcher._ensure_started()
+        batcher._other.extend([(i, 0, ENDPOINT, crumb('R', i)) for i in range(2)])
+    # without the batch route, breadcrumbs are sent one request each
+    assert not batcher.flush()
+    calls = [(c[1]['path'], c[1]['json_data']) for c in mock_request.call_args_list]
+    assert calls == [('/api/breadcrumb', crumb('R', 0)), ('/api/breadcrumb', crumb('R', 1))]
+    # and those not accepted are spooled
+    spooled.assert_called_once_with(ENDPOINT, '/api/breadcrumb', [crumb('R', 1)])
+
+
+def test_batch_endpoints(mock_request):
+    batcher = BreadcrumbBatcher(size=2, max_age=60)
+    with batcher._cond:
+        # hold the worker off while queueing
+        batcher._ensure_started()
+        batcher._other.extend(
+            [(0, 0, ENDPOINT, crumb(n=0)), (1, 0, 'https://other', crumb(n=1))]
+            + [(i, 0, ENDPOINT, crumb(n=i)) for i in range(2, 5)]
+        )
+    batcher.flush()
+    calls = [(c[0][0], c[1]['json_data']) for c in mock_request.call_args_list]
+    assert calls == [
+        (ENDPOINT, [crumb(n=0), crumb(n=2)]),
+        (ENDPOINT, [crumb(n=3), crumb(n=4)]),
+        ('https://other', [crumb(n=1)]),
+    ]
+
+
+def test_get_batcher(monkeypatch):
+    monkeypatch.setattr(batch, '_batcher', None)
+    monkeypatch.delenv('MIGAS_BATCH_SIZE', raising=False)
+    assert batch.get_batcher() is None
+
+    monkeypatch.setenv('MIGAS_BATCH_SIZE', '10')
+    monkeypatch.setenv('MIGAS_BATCH_AGE', '2.5')
+    batcher = batch.get_batcher()
+    assert batcher.size == 10
+    assert batcher.max_age == 2.5
+    assert batch.get_batcher() is batcher
+
+
+def test_tracker_batches_final(mock_requests, monkeypatch):
+    from migas.config import Config
+    from migas.tracker import track
+
+    monkeypatch.setattr(batch, '_batcher', BreadcrumbBatcher(size=10, max_age=60))
+    monkeypatch.setenv('MIGAS_BATCH_SIZE', '10')
+    batch._batcher.add(Config.endpoint, crumb('R'))
+
+    with track('nipreps/migas-py', '0.0.1'):
+        pass
+
+    assert mock_requests.request.call_count == 1
+    payloads = mock_requests.request.call_args[1]['json_data']
+    assert len(payloads) == 2
+    assert payloads[-1]['proc']['status'] == 'C'
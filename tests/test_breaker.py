@@ -0,0 +1,62 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from migas import breaker
+from migas import request as migas_request
+
+KEY = ('http', '127.0.0.1:1')
+
+
+@pytest.fixture(autouse=True)
+def threshold(monkeypatch):
+    monkeypatch.setenv('MIGAS_BREAKER_THRESHOLD', '2')
+    monkeypatch.setenv('MIGAS_BREAKER_COOLDOWN', '60')
+
+
+def test_breaker_states(monkeypatch):
+    assert breaker.allow(KEY)
+    breaker.record(KEY, success=False)
+    assert breaker.allow(KEY)
+    breaker.record(KEY, success=False)
+    # open
+    assert not breaker.allow(KEY)
+    assert breaker.allow(('http', 'localhost:8080'))
+
+    # half-open: a single probe is let through after the cooldown
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert breaker.allow(KEY)
+    assert not breaker.allow(KEY)
+
+    # a failed probe restarts the cooldown
+    breaker.record(KEY, success=False)
+    assert not breaker.allow(KEY)
+    monkeypatch.setattr(time, 'time', lambda: now + 122)
+    assert breaker.allow(KEY)
+
+    # a successful probe closes the breaker
+    breaker.record(KEY, success=True)
+    assert not breaker._state_file(KEY).exists()
+    assert breaker.allow(KEY)
+    assert breaker.allow(KEY)
+
+
+def test_breaker_disabled(monkeypatch):
+    monkeypatch.setenv('MIGAS_BREAKER_THRESHOLD', '0')
+    for _ in range(3):
+        breaker.record(KEY, success=False)
+    assert breaker.allow(KEY)
+
+
+def test_breaker_request(monkeypatch):
+    url = 'http://127.0.0.1:1/'
+    assert migas_request._request(url, method='GET') is migas_request.UNAVAIL_RESPONSE
+    assert migas_request._request(url, method='GET') is migas_request.UNAVAIL_RESPONSE
+
+    # no connection is attempted while the breaker is open
+    acquire = MagicMock()
+    monkeypatch.setattr(migas_request._pool, 'acquire', acquire)
+    assert migas_request._request(url, method='GET') is migas_request.UNAVAIL_RESPONSE
+    assert not acquire.called
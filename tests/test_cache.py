@@ -0,0 +1,70 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from migas import cache
+from migas.api import operations
+
+ENDPOINT = 'http://localhost:8080/graphql'
+RESPONSE = {'success': True, 'flagged': False, 'latest': '1.0.0', 'message': ''}
+
+
+def test_lookup_store(monkeypatch):
+    assert cache.lookup(ENDPOINT, 'owner/repo', '1.0.0') is None
+    cache.store(ENDPOINT, 'owner/repo', '1.0.0', RESPONSE)
+    assert cache.lookup(ENDPOINT, 'owner/repo', '1.0.0') == (RESPONSE, True)
+    assert cache.lookup(ENDPOINT, 'owner/repo', '0.9.0') is None
+    assert cache.lookup('https://other/graphql', 'owner/repo', '1.0.0') is None
+
+    # failures are not cached
+    cache.store(ENDPOINT, 'owner/repo', '0.9.0', {'success': False, 'message': 'error'})
+    assert cache.lookup(ENDPOINT, 'owner/repo', '0.9.0') is None
+
+    # stale, then expired
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + cache.DEFAULT_CHECK_TTL + 1)
+    assert cache.lookup(ENDPOINT, 'owner/repo', '1.0.0') == (RESPONSE, False)
+    monkeypatch.setenv('MIGAS_CHECK_MAX_STALE', '0')
+    assert cache.lookup(ENDPOINT, 'owner/repo', '1.0.0') is None
+
+    monkeypatch.setenv('MIGAS_CHECK_TTL', '0')
+    assert cache.lookup(ENDPOINT, 'owner/repo', '1.0.0') is None
+
+
+def test_store_bounded(monkeypatch):
+    monkeypatch.setattr(cache, 'MAX_ENTRIES', 2)
+    for version in ('1', '2', '3'):
+        cache.store(ENDPOINT, 'owner/repo', version, RESPONSE)
+    assert cache.lookup(ENDPOINT, 'owner/repo', '1') is None
+    assert cache.lookup(ENDPOINT, 'owner/repo', '3')
+
+
+@pytest.fixture
+def graphql(monkeypatch):
+    from migas.config import Config
+
+    monkeypatch.setattr(Config, 'endpoint', 'http://localhost:8080')
+    monkeypatch.setattr(Config, '_is_setup', True)
+    mock_req = MagicMock(return_value=(200, {'data': {'check_project': RESPONSE}}))
+    monkeypatch.setattr(operations, 'request', mock_req)
+    return mock_req
+
+
+def test_check_project_cached(graphql, monkeypatch):
+    from migas.request import flush
+
+    assert operations.check_project('owner/repo', '1.0.0') == RESPONSE
+    assert operations.check_project('owner/repo', '1.0.0') == RESPONSE
+    assert graphql.call_count == 1
+
+    # stale responses are returned immediately, and refreshed in the background
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + cache.DEFAULT_CHECK_TTL + 1)
+    updated = {**RESPONSE, 'latest': '1.1.0'}
+    graphql.return_value = (200, {'data': {'check_project': updated}})
+    assert operations.check_project('owner/repo', '1.0.0') == RESPONSE
+    assert flush(timeout=5)
+    assert graphql.call_count == 2
+    assert operations.check_project('owner/repo', '1.0.0') == updated
+    assert graphql.call_count == 2
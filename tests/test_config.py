@@ -20,8 +20,6 @@ def test_setup_default(tmp_path):
     assert uuid.UUID(conf.user_id)
     assert conf.session_id is None
     assert conf._is_setup is True
-    conf_file = conf._file
-    user_id = conf.user_id
 
     # if setup is called again, overwrite existing
     new_endpoint = 'https://migas-staging.herokuapp.com'
@@ -32,13 +30,14 @@ def test_setup_default(tmp_path):
     # but invalid UUIDs are not used
     config.setup(user_id='abc')
     assert conf.user_id != 'abc'
+    user_id = conf.user_id
 
     # can be reset
     conf._reset()
     assert conf.endpoint is None
     assert conf.session_id is None
-    # and loaded
-    conf.load(conf_file)
+    # and loaded from the registry
+    config.setup()
     assert conf.endpoint == config.DEFAULT_ENDPOINT
     assert conf.user_id == user_id
 
@@ -182,3 +181,33 @@ def test_clear_user_id(monkeypatch, tmp_path):
 
     # idempotent — no file present, no raise
     config.clear_user_id()
+
+
+def test_resolve_fqdn_timeout(monkeypatch):
+    """A hanging FQDN lookup falls back to the hostname, and is not retried for a while."""
+    import threading
+    import time
+
+    from migas import utils
+
+    monkeypatch.setattr(utils, '_host_cache_key', lambda: 'boot:python:env')
+    release = threading.Event()
+    monkeypatch.setattr(socket, 'getfqdn', lambda: release.wait(5) and 'node.cluster.edu')
+    monkeypatch.setattr(getpass, 'getuser', lambda: 'testuser')
+    monkeypatch.setattr(socket, 'gethostname', lambda: 'node001')
+    monkeypatch.delenv('HOSTNAME', raising=False)
+    monkeypatch.setenv('MIGAS_FQDN_TIMEOUT', '0.05')
+
+    start = time.monotonic()
+    uid = config._generate_stable_uuid()
+    assert time.monotonic() - start < 1
+    assert uid == str(uuid.uuid3(uuid.NAMESPACE_DNS, 'testuser@node001'))
+    assert 'fqdn' not in utils.read_host_cache()
+    release.set()
+
+    # the timeout is cached for a few minutes, not until the next reboot
+    assert config._resolve_fqdn() is None
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + config.FQDN_RETRY_INTERVAL)
+    assert config._resolve_fqdn() == 'node.cluster.edu'
+    assert utils.read_host_cache()['fqdn'] == 'node.cluster.edu'
@@ -0,0 +1,72 @@
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from migas import heartbeat
+from migas.heartbeat import HeartbeatScheduler
+from migas.tracker import track
+
+
+def test_heartbeat_schedule():
+    scheduler = HeartbeatScheduler(interval=10, max_interval=40)
+    # trackers are only added, not started, so no thread is needed
+    scheduler._thread = SimpleNamespace(is_alive=lambda: True)
+    first, second = SimpleNamespace(), SimpleNamespace()
+    scheduler.add(first)
+    scheduler.add(second)
+    scheduler.add(first)
+    assert len(scheduler) == 2
+    beats = scheduler._beats
+    start = beats[id(first)].due - 10
+    # second is due 1 second later, close enough to be coalesced
+    beats[id(second)].due = start + 11
+
+    assert scheduler._collect(start + 9) == []
+    assert [b.tracker for b in scheduler._collect(start + 10)] == [first, second]
+    # intervals grow geometrically, up to the ceiling
+    dues = []
+    now = start + 10
+    for _ in range(4):
+        now = min(b.due for b in beats.values())
+        assert len(scheduler._collect(now)) == 2
+        dues.append(now)
+    assert [b - a for a, b in itertools.pairwise(dues)] == pytest.approx([40, 40, 40])
+    assert dues[0] == pytest.approx(start + 30)
+    assert beats[id(first)].count == 5
+
+    scheduler.remove(first)
+    assert len(scheduler) == 1
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setenv('MIGAS_HEARTBEAT_INTERVAL', '0.05')
+    monkeypatch.setenv('MIGAS_HEARTBEAT_MAX_INTERVAL', '0.1')
+    monkeypatch.setattr(heartbeat, '_scheduler', None)
+    yield heartbeat.get_scheduler()
+    heartbeat._scheduler._beats.clear()
+
+
+def test_tracker_heartbeat(mock_requests, scheduler):
+    first = track('nipreps/migas-py', '0.0.1', heartbeat=True, signals=())
+    second = track('nipreps/migas-py', '0.0.2', heartbeat=True, signals=())
+    assert len(scheduler) == 2
+    assert [t.name for t in threading.enumerate()].count('migas-heartbeat') == 1
+
+    deadline = time.monotonic() + 5
+    while mock_requests.request.call_count < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # heartbeats of both trackers are sent together, one request each without batching
+    calls = mock_requests.request.call_args_list[:2]
+    assert {c[1]['path'] for c in calls} == {'/api/breadcrumb'}
+    crumbs = [c[1]['json_data'] for c in calls]
+    assert {c['project_version'] for c in crumbs} == {'0.0.1', '0.0.2'}
+    assert crumbs[0]['proc'] == {'status': 'R', 'status_desc': 'Heartbeat'}
+    assert crumbs[0]['metrics']['heartbeat']['count'] == 1
+
+    first.stop()
+    second.stop()
+    assert len(scheduler) == 0
@@ -0,0 +1,54 @@
+import subprocess as sp
+import sys
+from pathlib import Path
+
+import migas
+
+# Budget for the cumulative cost of `import migas`, in microseconds
+IMPORT_BUDGET_US = 20_000
+HEAVY_MODULES = ('ci_info', 'http.client', 'logging', 'socket', 'ssl', 'tempfile', 'uuid')
+
+
+def _importtime(code: str) -> dict[str, int]:
+    """Run `code` in a fresh interpreter, and return the cumulative import time of each module."""
+    proc = sp.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=Path(migas.__file__).parent.parent,
+        capture_output=True,
+        encoding='UTF-8',
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line.removeprefix('import time:').split('|')
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_time():
+    times = _importtime('import migas')
+    assert times['migas'] < IMPORT_BUDGET_US
+    assert not [m for m in times if m.startswith('migas.') and m != 'migas._version']
+    assert not [m for m in HEAVY_MODULES if m in times]
+
+
+def test_lazy_attributes():
+    code = 'import sys, migas; migas.setup; migas.track; print(*sorted(sys.modules))'
+    proc = sp.run(
+        [sys.executable, '-c', code],
+        cwd=Path(migas.__file__).parent.parent,
+        capture_output=True,
+        encoding='UTF-8',
+        check=True,
+    )
+    modules = proc.stdout.split()
+    assert 'migas.config' in modules
+    assert 'migas.tracker' in modules
+    assert 'migas.api' not in modules
+
+    assert callable(migas.add_breadcrumb)
+    assert migas.request.DEFAULT_TIMEOUT
+    assert 'check_project' in dir(migas)
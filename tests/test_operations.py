@@ -1,4 +1,6 @@
 import concurrent.futures
+from unittest.mock import MagicMock
+
 from migas.api.operations import CheckProject, GetUsage
 
 
@@ -7,27 +9,46 @@ def test_check_project_query():
         'project': 'owner/repo',
         'project_version': '1.0.0',
         'language': 'python',
+        'language_version': None,
         'is_ci': True,
     }
-    query = CheckProject._construct_query(params)
-    assert 'query' in query
-    assert 'check_project' in query
-    assert 'project:"owner/repo"' in query
-    assert 'project_version:"1.0.0"' in query
-    assert 'language:"python"' in query
-    assert 'is_ci:true' in query
-    # Check selections
-    assert 'success,flagged,latest,message' in query
+    query, variables = CheckProject.generate_query(**params)
+    assert query == (
+        'query CheckProject($project:String!,$project_version:String!,$language:String!)'
+        '{check_project(project:$project,project_version:$project_version,language:$language,'
+        'is_ci:true){success,flagged,latest,message}}'
+    )
+    assert variables == {'project': 'owner/repo', 'project_version': '1.0.0', 'language': 'python'}
+
+    # the query text only depends on which arguments are given
+    query2, variables = CheckProject.generate_query(
+        project='other/repo', project_version='2.0.0', language='python', is_ci=False
+    )
+    assert query2 == query.replace('is_ci:true', 'is_ci:false')
+    assert variables['project'] == 'other/repo'
 
 
 def test_get_usage_query():
-    params = {'project': 'owner/repo', 'start': '2023-01-01', 'unique': True}
-    query = GetUsage._construct_query(params)
-    assert 'query' in query
-    assert 'get_usage' in query
-    assert 'project:"owner/repo"' in query
-    assert 'start:"2023-01-01"' in query
-    assert 'unique:true' in query
+    query, variables = GetUsage.generate_query(
+        project='owner/repo', start='2023-01-01', unique=True
+    )
+    assert query == (
+        'query GetUsage($project:String!,$start:DateTime!)'
+        '{get_usage(project:$project,start:$start,unique:true)}'
+    )
+    assert variables == {'project': 'owner/repo', 'start': '2023-01-01'}
+
+
+def test_text_args_encoded():
+    # text arguments that are not strings are sent JSON-encoded
+    _, variables = CheckProject.generate_query(
+        project='owner/repo', project_version=1, language=['python', 'c']
+    )
+    assert variables == {
+        'project': 'owner/repo',
+        'project_version': '1',
+        'language': '["python", "c"]',
+    }
 
 
 def test_concurrent_query_generation():
@@ -37,7 +58,7 @@ def test_concurrent_query_generation():
     """
 
     def gen_query(project_name):
-        return CheckProject.generate_query(project=project_name, project_version='1.0.0')
+        return CheckProject.generate_query(project=project_name, project_version='1.0.0')[1]
 
     num_threads = 20
     num_queries = 100
@@ -47,5 +68,52 @@ def test_concurrent_query_generation():
         results = list(executor.map(gen_query, projects))
 
     for i, res in enumerate(results):
-        expected = f'project:"project-{i}"'
-        assert expected in res, f'Query {i} corrupted: {res}'
+        assert res['project'] == f'project-{i}', f'Query {i} corrupted: {res}'
+
+
+def test_aliased_query():
+    query, variables = CheckProject.generate_aliased_query(
+        [
+            {'project': 'owner/a', 'project_version': '1.0.0', 'is_ci': True},
+            {'project': 'owner/b', 'project_version': '2.0.0'},
+        ]
+    )
+    assert query == (
+        'query CheckProject($p0_project:String!,$p0_project_version:String!,'
+        '$p1_project:String!,$p1_project_version:String!)'
+        '{p0:check_project(project:$p0_project,project_version:$p0_project_version,is_ci:true)'
+        '{success,flagged,latest,message} '
+        'p1:check_project(project:$p1_project,project_version:$p1_project_version)'
+        '{success,flagged,latest,message}}'
+    )
+    assert variables == {
+        'p0_project': 'owner/a',
+        'p0_project_version': '1.0.0',
+        'p1_project': 'owner/b',
+        'p1_project_version': '2.0.0',
+    }
+
+
+def test_check_project_many(monkeypatch):
+    from migas.api import operations
+    from migas.config import Config
+
+    monkeypatch.setattr(Config, 'endpoint', 'http://localhost:8080')
+    monkeypatch.setattr(Config, '_is_setup', True)
+    ok = {'success': True, 'flagged': False, 'latest': '1.0.0', 'message': ''}
+    mock_req = MagicMock(return_value=(200, {'data': {'p0': ok, 'p1': None}}))
+    monkeypatch.setattr(operations, 'request', mock_req)
+
+    res = operations.check_project_many([('owner/a', '1.0.0'), ('owner/b', '0.1.0')])
+    assert mock_req.call_count == 1
+    assert res[0] == ok
+    assert res[1]['success'] is False
+
+    # only projects without a cached response are requested
+    mock_req.return_value = (200, {'data': {'p0': ok}})
+    res = operations.check_project_many([('owner/b', '0.1.0'), ('owner/a', '1.0.0')])
+    assert res == [ok, ok]
+    assert mock_req.call_args[1]['variables'] == {
+        'p0_project': 'owner/b',
+        'p0_project_version': '0.1.0',
+    }
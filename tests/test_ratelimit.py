@@ -0,0 +1,112 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+import migas
+from migas import config, ratelimit
+from migas.config import Config
+
+ENDPOINT = 'http://127.0.0.1:1/'
+
+
+def crumb(user_id: str | None = None, session_id: str | None = None, status: str = 'R') -> dict:
+    payload = {
+        'project': 'nipreps/migas-py',
+        'project_version': '0.0.1',
+        'proc': {'status': status},
+    }
+    if user_id or session_id:
+        payload['ctx'] = {'user_id': user_id, 'session_id': session_id}
+    return payload
+
+
+def test_sampling(monkeypatch):
+    sampled = [ratelimit.sampled(crumb(f'user-{i}'), 0.25) for i in range(4000)]
+    assert 900 < sum(sampled) < 1100
+    # sampling is deterministic, and nested: sessions sampled at a rate are sampled at any higher rate
+    assert sampled == [ratelimit.sampled(crumb(f'user-{i}'), 0.25) for i in range(4000)]
+    assert all(ratelimit.sampled(crumb(f'user-{i}'), 0.5) for i, s in enumerate(sampled) if s)
+    assert not any(ratelimit.sampled(crumb(f'user-{i}'), 0) for i in range(100))
+
+    monkeypatch.setenv('MIGAS_SAMPLE_RATE', '0.25')
+    kept = next(crumb(f'user-{i}') for i, s in enumerate(sampled) if s)
+    dropped = next(crumb(f'user-{i}') for i, s in enumerate(sampled) if not s)
+    assert ratelimit.admit(ENDPOINT, kept)
+    assert kept['metrics'] == {'sample_rate': 0.25}
+    assert not ratelimit.admit(ENDPOINT, dropped)
+
+
+def test_sampling_without_session(monkeypatch):
+    # without a session ID, each process of a user is sampled on its own
+    sampled = []
+    for pid in range(1000, 5000):
+        monkeypatch.setattr(ratelimit.os, 'getpid', lambda pid=pid: pid)
+        sampled.append(ratelimit.sampled(crumb('user-0'), 0.25))
+    assert 900 < sum(sampled) < 1100
+    # with a session ID, all processes of the session are sampled alike
+    decisions = set()
+    for pid in range(1000, 1100):
+        monkeypatch.setattr(ratelimit.os, 'getpid', lambda pid=pid: pid)
+        decisions.add(ratelimit.sampled(crumb('user-0', 'session-0'), 0.25))
+    assert len(decisions) == 1
+
+
+def test_token_bucket(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(ratelimit.time, 'time', lambda: now)
+    assert all(ratelimit.acquire(ENDPOINT, 'a') for _ in range(100))
+
+    monkeypatch.setenv('MIGAS_RATE_LIMIT', '0.5')
+    monkeypatch.setenv('MIGAS_RATE_BURST', '3')
+    assert [ratelimit.acquire(ENDPOINT, 'a') for _ in range(4)] == [True, True, True, False]
+    # buckets are kept per project
+    assert ratelimit.acquire(ENDPOINT, 'b')
+
+    now += 2
+    assert [ratelimit.acquire(ENDPOINT, 'a') for _ in range(2)] == [True, False]
+    now += 100
+    assert [ratelimit.acquire(ENDPOINT, 'a') for _ in range(4)] == [True, True, True, False]
+
+
+def test_token_bucket_shared(monkeypatch):
+    monkeypatch.setenv('MIGAS_RATE_LIMIT', '0.001')
+    monkeypatch.setenv('MIGAS_RATE_BURST', '2')
+    code = f'from migas import ratelimit; print(ratelimit.acquire("{ENDPOINT}", "a"))'
+    taken = [
+        subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        for _ in range(2)
+    ]
+    assert taken == ['True', 'True']
+    assert not ratelimit.acquire(ENDPOINT, 'a')
+
+
+def test_rate_limited_final(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, '_get_config_dir', lambda: tmp_path)
+    monkeypatch.setenv('MIGAS_SPOOL', '1')
+    monkeypatch.setenv('MIGAS_RATE_LIMIT', '0.001')
+    monkeypatch.setenv('MIGAS_RATE_BURST', '1')
+    assert ratelimit.admit(ENDPOINT, crumb(status='R'))
+    assert not ratelimit.admit(ENDPOINT, crumb(status='R'))
+    assert not (tmp_path / 'spool').exists()
+    # final breadcrumbs are spooled to be sent later
+    assert not ratelimit.admit(ENDPOINT, crumb(status='C'))
+    records = (tmp_path / 'spool' / 'breadcrumbs.jsonl').read_text().splitlines()
+    assert [json.loads(r)['payload']['proc'] for r in records] == [{'status': 'C'}]
+
+
+@pytest.mark.filterwarnings('ignore')
+def test_add_breadcrumb_not_admitted(local_server, monkeypatch):
+    monkeypatch.setattr(Config, 'endpoint', local_server.url)
+    monkeypatch.setattr(Config, '_is_setup', True)
+    monkeypatch.setenv('MIGAS_SAMPLE_RATE', '0')
+    assert migas.add_breadcrumb('nipreps/migas-py', '0.0.1', wait=True) == ratelimit.not_admitted()
+    assert migas.add_breadcrumb('nipreps/migas-py', '0.0.1') is None
+
+    monkeypatch.setenv('MIGAS_SAMPLE_RATE', '1')
+    assert migas.add_breadcrumb('nipreps/migas-py', '0.0.1', wait=True) == {'success': True}
+    assert len(local_server.breadcrumbs) == 1
+    assert 'metrics' not in local_server.breadcrumbs[0]
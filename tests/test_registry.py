@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess as sp
+import sys
+
+from migas import registry
+from migas.utils import get_runtime_dir
+
+
+def entries() -> dict:
+    return json.loads((get_runtime_dir() / registry.REGISTRY_FILE).read_text())
+
+
+def test_process_key():
+    key = registry.process_key(os.getpid())
+    assert key.split(':')[0] == str(os.getpid())
+    assert registry.ancestors()[0] == key
+    if os.path.isdir('/proc/self'):
+        assert registry.ancestors()[1].split(':')[0] == str(os.getppid())
+
+    proc = sp.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    assert registry.process_key(proc.pid) is None
+
+
+def test_register_lookup():
+    assert registry.lookup() is None
+    registry.register({'endpoint': 'abc'})
+    assert registry.lookup() == {'endpoint': 'abc'}
+    # one entry per process
+    registry.register({'endpoint': 'def'})
+    assert list(entries().values()) == [{'endpoint': 'def'}]
+
+
+def test_lookup_ancestor():
+    """Grandchildren find the configuration of the closest configured ancestor."""
+    registry.register({'endpoint': 'abc'})
+    code = (
+        'import subprocess, sys; '
+        "subprocess.run([sys.executable, '-c', "
+        '"from migas import registry; print(registry.lookup())"])'
+    )
+    proc = sp.run([sys.executable, '-c', code], capture_output=True, encoding='UTF-8', check=True)
+    assert proc.stdout.strip() == "{'endpoint': 'abc'}"
+
+
+def test_register_gc():
+    code = "from migas import registry; registry.register({'endpoint': 'child'})"
+    sp.run([sys.executable, '-c', code], check=True)
+    assert len(entries()) == 1
+    # the child has exited, so its entry is dropped once the registry is written
+    registry.register({'endpoint': 'parent'})
+    assert list(entries().values()) == [{'endpoint': 'parent'}]
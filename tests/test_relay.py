@@ -0,0 +1,95 @@
+import json
+import signal
+import socket
+import subprocess
+import sys
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from migas import relay
+from migas import request as migas_request
+
+ROUTE = '/api/breadcrumb'
+CRUMB = {'project': 'nipreps/migas-py', 'project_version': '0.0.1'}
+
+
+@pytest.fixture(autouse=True)
+def relay_state(monkeypatch):
+    monkeypatch.setattr(relay, '_retry_at', 0.0)
+    monkeypatch.delenv('MIGAS_RELAY', raising=False)
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_relay_unavailable(monkeypatch):
+    assert not relay.send('http://127.0.0.1:1/', ROUTE, CRUMB)
+    # the relay is not looked for again right away
+    assert relay._retry_at > time.monotonic()
+
+
+def test_relay_send(monkeypatch):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(str(relay._socket_path()))
+    sock.settimeout(5)
+    mock_req = MagicMock()
+    monkeypatch.setattr(migas_request, '_send_request', mock_req)
+    try:
+        assert migas_request.request('http://127.0.0.1:1/', path=ROUTE, json_data=CRUMB) is None
+        message = json.loads(sock.recv(relay.MAX_DATAGRAM_SIZE))
+        assert message == {'endpoint': 'http://127.0.0.1:1/', 'path': ROUTE, 'payload': CRUMB}
+        assert migas_request._request('http://127.0.0.1:1/', path=ROUTE, json_data=CRUMB) == (
+            migas_request.RELAYED_RESPONSE
+        )
+        sock.recv(relay.MAX_DATAGRAM_SIZE)
+
+        # only breadcrumbs that are not waited for are relayed
+        migas_request._request('http://127.0.0.1:1/', path=ROUTE, json_data=CRUMB, wait=True)
+        migas_request._request('http://127.0.0.1:1/', path='/graphql', json_data={'query': ''})
+        monkeypatch.setenv('MIGAS_RELAY', '0')
+        migas_request._request('http://127.0.0.1:1/', path=ROUTE, json_data=CRUMB)
+        assert mock_req.call_count == 3
+    finally:
+        sock.close()
+
+
+@pytest.mark.filterwarnings('ignore')
+@pytest.mark.parametrize('batch_size', [None, '100'])
+def test_relay_daemon(local_server, monkeypatch, batch_size):
+    if batch_size is not None:
+        monkeypatch.setenv('MIGAS_BATCH_SIZE', batch_size)
+        local_server.batch_route = True
+
+    def start():
+        cmd = [sys.executable, '-m', 'migas.relay', '--batch-age', '0.1']
+        return subprocess.Popen(cmd, stderr=subprocess.PIPE, text=True)
+
+    proc = start()
+    try:
+        wait_for(relay._socket_path().exists)
+        # a single relay runs at a time
+        second = start()
+        assert second.wait(10) == 1
+        assert 'already running' in second.stderr.read()
+
+        start_time = time.monotonic()
+        for i in range(20):
+            crumb = {**CRUMB, 'project_version': str(i)}
+            migas_request._request(local_server.url, path=ROUTE, json_data=crumb)
+        assert time.monotonic() - start_time < 1
+        wait_for(lambda: len(local_server.breadcrumbs) == 20)
+        # batches are only sent if the server is known to accept them
+        route = '/api/breadcrumbs' if batch_size else ROUTE
+        assert {path for path, _ in local_server.received} == {route}
+        assert local_server.connections == 1
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(10) == 0
+        proc.stderr.close()
+    assert not relay._socket_path().exists()
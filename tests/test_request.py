@@ -1,5 +1,11 @@
+import subprocess
+import sys
+import threading
+import time
+
 import pytest
 
+from migas import request as migas_request
 from migas.request import _request
 
 GET_URL = 'https://httpbin.org/get'
@@ -33,3 +39,156 @@ def test_timeout(monkeypatch):
     status, res = _request(GET_URL, method='GET')
     assert status == 200
     assert res
+
+
+def test_request_nonblocking(monkeypatch):
+    release = threading.Event()
+    sent = []
+
+    def slow_request(url, **kwargs):
+        release.wait(5)
+        sent.append(kwargs['json_data'])
+        return 200, {}
+
+    monkeypatch.setattr(migas_request, '_request', slow_request)
+    start = time.monotonic()
+    assert migas_request.request(GET_URL, json_data={'n': 1}) is None
+    assert migas_request.request(GET_URL, json_data={'n': 2}) is None
+    assert time.monotonic() - start < 1
+    assert not sent
+
+    assert migas_request.flush(timeout=0.01) is False
+    release.set()
+    assert migas_request.flush(timeout=5) is True
+    # calls are sent in order from a single thread
+    assert sent == [{'n': 1}, {'n': 2}]
+
+
+def test_sender_shutdown(monkeypatch):
+    sent = []
+    monkeypatch.setattr(migas_request, '_request', lambda url, **kw: sent.append(url))
+    migas_request.request(GET_URL)
+    assert migas_request.shutdown(timeout=5) is True
+    assert sent == [GET_URL]
+    # sender is restarted lazily
+    migas_request.request(POST_URL)
+    assert migas_request.flush(timeout=5) is True
+    assert sent == [GET_URL, POST_URL]
+
+
+def test_sender_flushed_at_exit(local_server):
+    code = (
+        'import migas; '
+        f'migas.setup(endpoint={local_server.url!r}); '
+        "migas.add_breadcrumb('nipreps/migas-py', '0.0.1')"
+    )
+    subprocess.run([sys.executable, '-c', code], check=True, timeout=30)
+    assert len(local_server.breadcrumbs) == 1
+
+
+def test_sender_bounded():
+    sender = migas_request._Sender(maxsize=1)
+    release = threading.Event()
+    assert sender.submit(release.wait, 5)
+    # wait for the worker to pick up the first call
+    while sender._queue.qsize():
+        time.sleep(0.001)
+    assert sender.submit(release.wait, 5)
+    assert not sender.submit(release.wait, 5)
+    release.set()
+    assert sender.shutdown(timeout=5)
+
+
+def test_connection_reuse(local_server):
+    url = f'http://127.0.0.1:{local_server.server_port}/'
+    for _ in range(3):
+        status, res = _request(url, method='GET')
+        assert status == 200
+        assert res == {'success': True}
+    assert local_server.connections == 1
+
+
+def test_connection_reconnect(local_server):
+    url = f'http://127.0.0.1:{local_server.server_port}/'
+    local_server.keep_alive = False
+    for _ in range(3):
+        status, _ = _request(url, method='GET')
+        assert status == 200
+    assert local_server.connections == 3
+
+
+def test_connection_pool_settings(local_server, monkeypatch):
+    url = f'http://127.0.0.1:{local_server.server_port}/'
+    monkeypatch.setenv('MIGAS_POOL_SIZE', '0')
+    _request(url, method='GET')
+    _request(url, method='GET')
+    assert local_server.connections == 2
+
+    monkeypatch.setenv('MIGAS_POOL_SIZE', '1')
+    monkeypatch.setenv('MIGAS_POOL_IDLE_TIMEOUT', '0')
+    _request(url, method='GET')
+    _request(url, method='GET')
+    assert local_server.connections == 4
+
+
+@pytest.mark.parametrize('encoding', [None, 'gzip', 'deflate'])
+def test_response_decoder(encoding):
+    import gzip
+    import zlib
+
+    data = b'{"hits": 1}' * 1000
+    compressed = {None: data, 'gzip': gzip.compress(data), 'deflate': zlib.compress(data)}
+    body = compressed[encoding]
+
+    decoder = migas_request._ResponseDecoder(encoding, max_size=len(data))
+    for i in range(0, len(body), 100):
+        decoder.feed(body[i : i + 100])
+    assert decoder.finish() == data
+
+    decoder = migas_request._ResponseDecoder(encoding, max_size=len(data) - 1)
+    with pytest.raises(migas_request._ResponseTooLarge):
+        decoder.feed(body)
+        decoder.finish()
+
+
+def test_response_too_large(local_server, monkeypatch):
+    url = f'http://127.0.0.1:{local_server.server_port}/'
+    monkeypatch.setenv('MIGAS_MAX_RESPONSE_SIZE', '5')
+    assert _request(url, method='GET') is migas_request.OVERSIZED_RESPONSE
+
+    # the connection was not returned to the pool
+    monkeypatch.delenv('MIGAS_MAX_RESPONSE_SIZE')
+    assert _request(url, method='GET') == (200, {'success': True})
+    assert local_server.connections == 2
+
+
+def test_request_compression(local_server, monkeypatch):
+    url = f'http://127.0.0.1:{local_server.server_port}/'
+    large = {'error_desc': 'Traceback' * 500}
+    monkeypatch.delenv('MIGAS_COMPRESS', raising=False)
+
+    # not until the server advertises support
+    _request(url, json_data=large)
+    local_server.accept_encoding = 'gzip'
+    _request(url, json_data={'small': True})
+    _request(url, json_data=large)
+    assert local_server.encodings == [None, None, 'gzip']
+    assert local_server.received[-1][1] == large
+
+    # compressed requests that are rejected are resent as is, and compression is disabled
+    local_server.encodings.clear()
+    monkeypatch.setenv('MIGAS_COMPRESS', '1')
+    migas_request._compression.clear()
+    local_server.reject_gzip = True
+    assert _request(url, json_data=large) == (200, {'success': True})
+    _request(url, json_data=large)
+    assert local_server.encodings == ['gzip', None, None]
+
+
+def test_ssl_context_cached():
+    migas_request._ssl_context.cache_clear()
+    ctx = migas_request._ssl_context()
+    assert migas_request._ssl_context() is ctx
+    conn = migas_request._new_connection(('https', 'example.org'), 1)
+    assert isinstance(conn, migas_request._https_connection_class())
+    assert conn._context is ctx
@@ -0,0 +1,150 @@
+import pytest
+
+from migas import batch, rollup
+from migas.config import Config
+from migas.tracker import track
+from migas.utils import file_lock
+
+
+def crumb(status: str = 'C', error_type: str | None = None, **kwargs) -> dict:
+    proc = {'status': status, 'error_type': error_type} if error_type else {'status': status}
+    return {'project': 'nipreps/migas-py', 'project_version': '0.0.1', 'proc': proc, **kwargs}
+
+
+@pytest.fixture
+def rollup_server(local_server, monkeypatch):
+    monkeypatch.setenv('MIGAS_ROLLUP', '1')
+    monkeypatch.setattr(Config, 'endpoint', local_server.url)
+    monkeypatch.setattr(Config, '_is_setup', True)
+    return local_server
+
+
+def test_rollup_record(monkeypatch):
+    endpoint = 'http://127.0.0.1:1/'
+    assert not rollup.record(endpoint, crumb())
+
+    monkeypatch.setenv('MIGAS_ROLLUP', '1')
+    assert rollup.record(endpoint, crumb())
+    assert rollup.record(endpoint, crumb('F', 'ValueError'))
+    # breadcrumbs that do not fit in a record, or carry metrics, are sent as usual
+    assert not rollup.record(endpoint, {**crumb(), 'project': 'a' * 92})
+    assert not rollup.record(endpoint, crumb(metrics={'spans': {}}))
+
+    data = rollup._rollup_file(endpoint).read_bytes()
+    assert len(data) == 2 * rollup.RECORD.size
+    outcomes = rollup._unpack(data + b'partial')
+    assert {k: v[0] for k, v in outcomes.items()} == {
+        ('C', 'nipreps/migas-py', '0.0.1', ''): 1,
+        ('F', 'nipreps/migas-py', '0.0.1', 'ValueError'): 1,
+    }
+
+
+@pytest.mark.filterwarnings('ignore')
+def test_rollup_flush(rollup_server):
+    endpoint = rollup_server.url
+    for _ in range(5):
+        assert rollup.record(endpoint, crumb('R'))
+        assert rollup.record(endpoint, crumb('C'))
+    assert rollup.record(endpoint, crumb('F', 'ValueError'))
+    # not due yet
+    assert rollup.flush(endpoint) == 0
+
+    # only the elected process sends the rollup
+    with file_lock(rollup._rollup_file(endpoint).with_suffix('.send.lock')):
+        assert rollup.flush(endpoint, force=True) == 0
+
+    assert rollup.flush(endpoint, force=True) == 3
+    assert [path for path, _ in rollup_server.received] == ['/api/breadcrumb'] * 3
+    counts = {
+        (c['proc']['status'], c['proc'].get('error_type')): c['metrics']['rollup']['count']
+        for c in rollup_server.breadcrumbs
+    }
+    assert counts == {('R', None): 5, ('C', None): 5, ('F', 'ValueError'): 1}
+    assert not rollup._rollup_file(endpoint).exists()
+    assert rollup.flush(endpoint, force=True) == 0
+
+
+@pytest.mark.filterwarnings('ignore')
+def test_rollup_flush_batched(rollup_server, monkeypatch):
+    monkeypatch.setenv('MIGAS_BATCH_SIZE', '10')
+    monkeypatch.setattr(batch, '_batcher', None)
+    rollup_server.batch_route = True
+    endpoint = rollup_server.url
+    assert rollup.record(endpoint, crumb('R'))
+    assert rollup.record(endpoint, crumb('C'))
+    assert rollup.flush(endpoint, force=True) == 2
+    assert [path for path, _ in rollup_server.received] == ['/api/breadcrumbs']
+
+
+@pytest.mark.filterwarnings('ignore')
+def test_rollup_flush_failed(rollup_server):
+    endpoint = rollup_server.url
+    for _ in range(3):
+        assert rollup.record(endpoint, crumb('C'))
+    assert rollup.record(endpoint, crumb('F', 'ValueError'))
+    outcomes = rollup._unpack(rollup._rollup_file(endpoint).read_bytes())
+
+    # outcomes that could not be sent are kept, as a single record each
+    rollup_server.error_rate = 1
+    assert rollup.flush(endpoint, force=True) == 0
+    data = rollup._rollup_file(endpoint).read_bytes()
+    assert len(data) == 2 * rollup.RECORD.size
+    assert rollup._unpack(data) == outcomes
+
+    rollup_server.error_rate = 0
+    assert rollup.flush(endpoint, force=True) == 2
+    counts = [c['metrics']['rollup']['count'] for c in rollup_server.breadcrumbs]
+    assert counts == [3, 1]
+    assert not rollup._rollup_file(endpoint).exists()
+
+
+@pytest.mark.filterwarnings('ignore')
+def test_rollup_flush_rejected(rollup_server):
+    endpoint = rollup_server.url
+    assert rollup.record(endpoint, crumb('C'))
+    # outcomes rejected for good are not kept
+    rollup_server.error_rate = 1
+    rollup_server.error_status = 422
+    assert rollup.flush(endpoint, force=True) == 0
+    assert not rollup._rollup_file(endpoint).exists()
+
+
+def test_rollup_max_bytes(monkeypatch):
+    endpoint = 'http://127.0.0.1:1/'
+    monkeypatch.setenv('MIGAS_ROLLUP', '1')
+    monkeypatch.setenv('MIGAS_ROLLUP_MAX_BYTES', str(10 * rollup.RECORD.size))
+    for _ in range(1000):
+        assert rollup.record(endpoint, crumb('C'))
+        assert rollup.record(endpoint, crumb('F', 'ValueError'))
+    # the rollup is compacted to a record per outcome, keeping the counts
+    rollup_file = rollup._rollup_file(endpoint)
+    assert rollup_file.stat().st_size <= 10 * rollup.RECORD.size
+    counts = {k[0]: v[0] for k, v in rollup._unpack(rollup_file.read_bytes()).items()}
+    assert counts == {'C': 1000, 'F': 1000}
+
+    # once the outcomes themselves do not fit, the most frequent are kept
+    for i in range(20):
+        assert rollup.record(endpoint, crumb('F', f'Error{i}'))
+    assert rollup_file.stat().st_size <= 10 * rollup.RECORD.size
+    assert {'C', 'F'} <= {k[0] for k in rollup._unpack(rollup_file.read_bytes())}
+    assert ('C', 'nipreps/migas-py', '0.0.1', '') in rollup._unpack(rollup_file.read_bytes())
+
+
+@pytest.mark.filterwarnings('ignore')
+def test_rollup_due(rollup_server, monkeypatch):
+    import migas
+
+    monkeypatch.setenv('MIGAS_ROLLUP_INTERVAL', '0')
+    migas.add_breadcrumb('nipreps/migas-py', '0.0.1', status='R')
+    assert len(rollup_server.breadcrumbs) == 1
+    assert rollup_server.breadcrumbs[0]['metrics']['rollup']['count'] == 1
+
+
+def test_tracker_rollup(mock_requests, monkeypatch):
+    monkeypatch.setenv('MIGAS_ROLLUP', '1')
+    monkeypatch.setattr(Config, 'endpoint', 'http://127.0.0.1:1/')
+    with track('nipreps/migas-py', '0.0.1', signals=()):
+        pass
+    assert not mock_requests.request.called
+    data = rollup._rollup_file('http://127.0.0.1:1/').read_bytes()
+    assert list(rollup._unpack(data)) == [('C', 'nipreps/migas-py', '0.0.1', '')]
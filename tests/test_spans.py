@@ -0,0 +1,42 @@
+import threading
+
+from migas.spans import OTHER, Span, SpanTable
+
+
+def test_span_table():
+    table = SpanTable(max_names=2)
+    table.record('a', 10)
+    table.record('a', 30)
+    table.record('b', 5)
+    # further names are aggregated
+    table.record('c', 7)
+    table.record('d', 1)
+    assert table.raw() == {'a': [2, 40, 30], 'b': [1, 5, 5], OTHER: [2, 8, 7]}
+
+    table.merge({'a': [3, 60, 50], 'e': [1, 2, 2]})
+    assert table.raw()['a'] == [5, 100, 50]
+    assert table.raw()[OTHER] == [3, 10, 7]
+    assert table.summary()['a'] == {'count': 5, 'total': 1e-7, 'max': 5e-8}
+
+
+def test_span_forms():
+    table = SpanTable()
+    with Span(table, 'block'):
+        pass
+
+    @Span(table, 'func')
+    def recurse(n):
+        return recurse(n - 1) if n else 0
+
+    recurse(3)
+    threads = [threading.Thread(target=recurse, args=(10,)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    raw = table.raw()
+    assert raw['block'][0] == 1
+    assert raw['func'][0] == 4 + 4 * 11
+    # nested calls are included in the outermost one
+    assert raw['func'][2] <= raw['func'][1]
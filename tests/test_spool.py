@@ -0,0 +1,146 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from migas import batch, config, spool
+from migas.request import _request, flush
+
+ENDPOINT = 'http://127.0.0.1:1/'
+ROUTE = '/api/breadcrumb'
+
+
+@pytest.fixture
+def spool_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, '_get_config_dir', lambda: tmp_path)
+    monkeypatch.setenv('MIGAS_SPOOL', '1')
+    return tmp_path / 'spool'
+
+
+def read_spool(spool_dir, name=spool.SPOOL_FILE) -> list:
+    return [json.loads(line) for line in (spool_dir / name).read_text().splitlines()]
+
+
+def test_spool_failed_request(spool_dir):
+    status, _ = _request(ENDPOINT, path=ROUTE, json_data={'project': 'a'}, timeout=1)
+    assert status == 503
+    assert read_spool(spool_dir) == [{'endpoint': ENDPOINT, 'payload': {'project': 'a'}}]
+    assert (spool_dir / spool.SPOOL_FILE).stat().st_mode & 0o777 == 0o600
+
+    # only breadcrumbs are spooled
+    _request(ENDPOINT, path='/graphql', json_data={'query': 'a'}, timeout=1)
+    assert len(read_spool(spool_dir)) == 1
+
+
+def test_spool_disabled(spool_dir, monkeypatch):
+    monkeypatch.delenv('MIGAS_SPOOL')
+    _request(ENDPOINT, path=ROUTE, json_data={'project': 'a'}, timeout=1)
+    assert not spool_dir.exists()
+
+
+def test_spool_rotation(spool_dir, monkeypatch):
+    monkeypatch.setenv('MIGAS_SPOOL_MAX_BYTES', '200')
+    for i in range(10):
+        spool.append(ENDPOINT, [{'project': 'a', 'project_version': str(i)}])
+
+    current = read_spool(spool_dir)
+    previous = read_spool(spool_dir, f'{spool.SPOOL_FILE}.1')
+    assert (spool_dir / spool.SPOOL_FILE).stat().st_size <= 200
+    # oldest breadcrumbs are discarded, newest are kept in order
+    versions = [r['payload']['project_version'] for r in previous + current]
+    assert versions == [str(i) for i in range(10 - len(versions), 10)]
+
+
+def test_spool_replay(spool_dir, monkeypatch):
+    spool.append(ENDPOINT, [{'project': 'a'}, {'project': 'b'}])
+    spool.append('https://other/', [{'project': 'c'}])
+    mock_req = MagicMock(return_value=(200, {'success': True}))
+    monkeypatch.setattr('migas.request._request', mock_req)
+
+    spool.replay(wait=True)
+    calls = [(c[0][0], c[1]['path'], c[1]['json_data']) for c in mock_req.call_args_list]
+    assert calls == [
+        (ENDPOINT, ROUTE, {'project': 'a'}),
+        (ENDPOINT, ROUTE, {'project': 'b'}),
+        ('https://other/', ROUTE, {'project': 'c'}),
+    ]
+    assert not spool.has_spooled()
+
+
+def test_spool_replay_batched(spool_dir, monkeypatch):
+    monkeypatch.setenv('MIGAS_BATCH_SIZE', '10')
+    monkeypatch.setattr(batch, '_batcher', None)
+    spool.append(ENDPOINT, [{'project': 'a'}, {'project': 'b'}])
+    spool.append('https://other/', [{'project': 'c'}])
+    mock_req = MagicMock(return_value=(200, {'success': True}))
+    monkeypatch.setattr('migas.request._request', mock_req)
+
+    spool.replay(wait=True)
+    calls = [(c[0][0], c[1]['path'], c[1]['json_data']) for c in mock_req.call_args_list]
+    assert calls == [
+        (ENDPOINT, '/api/breadcrumbs', [{'project': 'a'}, {'project': 'b'}]),
+        ('https://other/', '/api/breadcrumbs', [{'project': 'c'}]),
+    ]
+    assert not spool.has_spooled()
+
+
+def test_spool_replay_rejected(spool_dir, local_server):
+    local_server.error_rate = 1
+    payloads = [{'project': str(i)} for i in range(3)]
+    spool.append(local_server.url, payloads)
+
+    # server errors keep the breadcrumbs for later
+    spool.replay(wait=True)
+    assert local_server.requests == 1
+    assert [r['payload'] for r in read_spool(spool_dir)] == payloads
+
+    local_server.error_rate = 0
+    spool.replay(wait=True)
+    assert not spool.has_spooled()
+    assert local_server.breadcrumbs == payloads
+
+
+@pytest.mark.parametrize('batch_size', [None, '10'])
+def test_spool_replay_poisoned(spool_dir, monkeypatch, batch_size):
+    if batch_size is not None:
+        monkeypatch.setenv('MIGAS_BATCH_SIZE', batch_size)
+        monkeypatch.setattr(batch, '_batcher', None)
+    payloads = [{'project': p} for p in ('bad', 'good1', 'good2')]
+    spool.append(ENDPOINT, payloads)
+
+    def respond(url, path, json_data, **kwargs):
+        crumbs = json_data if isinstance(json_data, list) else [json_data]
+        if {'project': 'bad'} in crumbs:
+            return 422, {'detail': 'Unprocessable'}
+        sent.extend(crumbs)
+        return 200, {'success': True}
+
+    sent = []
+    monkeypatch.setattr('migas.request._request', respond)
+    # a breadcrumb rejected for good is dropped, and does not hold back the others
+    spool.replay(wait=True)
+    assert sent == payloads[1:]
+    assert not spool.has_spooled()
+
+
+def test_spool_replay_offline(spool_dir, monkeypatch):
+    monkeypatch.setenv('MIGAS_BATCH_SIZE', '10')
+    monkeypatch.setattr(batch, '_batcher', None)
+    monkeypatch.setattr(spool, 'REPLAY_BATCH_SIZE', 2)
+    payloads = [{'project': str(i)} for i in range(5)]
+    spool.append(ENDPOINT, payloads)
+
+    # first chunk fails and is spooled again, the rest is kept without being sent
+    spool.replay(wait=True)
+    assert [r['payload'] for r in read_spool(spool_dir)] == payloads
+
+
+def test_spool_setup_replays(spool_dir, monkeypatch):
+    spool.append(ENDPOINT, [{'project': 'a'}])
+    mock_req = MagicMock(return_value=(200, {'success': True}))
+    monkeypatch.setattr('migas.request._request', mock_req)
+
+    config.setup(endpoint=ENDPOINT, save_config=False)
+    assert flush(timeout=5)
+    assert mock_req.call_args[1]['json_data'] == {'project': 'a'}
+    assert not spool.has_spooled()
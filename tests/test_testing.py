@@ -0,0 +1,76 @@
+import pytest
+
+import migas
+from migas.config import Config
+from migas.request import _request
+from migas.testing import MigasServer
+
+pytestmark = pytest.mark.filterwarnings('ignore')
+
+
+@pytest.fixture
+def server(local_server, monkeypatch):
+    monkeypatch.setattr(Config, 'endpoint', local_server.url)
+    monkeypatch.setattr(Config, '_is_setup', True)
+    return local_server
+
+
+def test_server_breadcrumbs(server):
+    assert migas.add_breadcrumb('nipreps/migas-py', '0.0.1', wait=True) == {'success': True}
+    crumbs = [{'project': 'nipreps/migas-py', 'project_version': str(i)} for i in range(3)]
+    # like a stock server, batches are only accepted if enabled
+    assert _request(server.url, path='/api/breadcrumbs', json_data=crumbs)[0] == 404
+    assert len(server.breadcrumbs) == 1
+    server.batch_route = True
+    assert _request(server.url, path='/api/breadcrumbs', json_data=crumbs) == (
+        200,
+        {'success': True},
+    )
+    assert [c['project_version'] for c in server.breadcrumbs] == ['0.0.1', '0', '1', '2']
+    assert server.received[0][0] == '/api/breadcrumb?wait=true'
+    assert len(server.received) == 3
+    assert _request(server.url, path='/api/unknown', json_data={})[0] == 404
+
+
+def test_server_queries(server):
+    server.latest['nipreps/migas-py'] = '1.0.0'
+    server.flagged.add(('nipreps/migas-py', '0.0.1'))
+    res = migas.check_project('nipreps/migas-py', '0.0.1')
+    assert res == {'success': True, 'flagged': True, 'latest': '1.0.0', 'message': ''}
+
+    many = migas.check_project_many([('nipreps/migas-py', '0.0.2'), ('nipreps/other', '2.0')])
+    assert [r['latest'] for r in many] == ['1.0.0', '2.0']
+    assert [r['flagged'] for r in many] == [False, False]
+
+    migas.add_breadcrumb('nipreps/migas-py', '0.0.1', user_id='a', wait=True)
+    migas.add_breadcrumb('nipreps/migas-py', '0.0.1', user_id='a', wait=True)
+    res = migas.get_usage('nipreps/migas-py', '2022-07-01')
+    assert res == {'success': True, 'hits': 2, 'unique': 1, 'message': ''}
+    assert migas.get_usage('nipreps/migas-py', '2022-07-01', unique=True)['hits'] == 1
+
+
+def test_server_faults():
+    with MigasServer(error_rate=1, error_status=500) as server:
+        assert _request(server.url, method='GET') == (500, {'detail': 'Injected error'})
+        assert server.errors == 1
+
+    with MigasServer(drop_rate=1) as server:
+        status, _ = _request(server.url, method='GET')
+        assert status == 503
+        assert server.drops == 1
+
+    with MigasServer(latency=0.5) as server:
+        assert _request(server.url, method='GET', timeout=0.05)[0] == 408
+
+    # faults are drawn from a seeded generator
+    with MigasServer(error_rate=0.5, seed=0) as server:
+        statuses = [_request(server.url, method='GET')[0] for _ in range(20)]
+    with MigasServer(error_rate=0.5, seed=0) as server:
+        assert [_request(server.url, method='GET')[0] for _ in range(20)] == statuses
+    assert {200, 503} == set(statuses)
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'deflate'])
+def test_server_response_encoding(encoding):
+    with MigasServer(response_encoding=encoding) as server:
+        assert _request(server.url, method='GET') == (200, {'success': True})
@@ -149,3 +149,143 @@ def test_tracker_decorator(mock_requests):
         failed()
 
     assert mock_requests.request.call_args[1]['json_data']['proc']['status'] == 'F'
+
+
+def test_exit_budget(mock_requests, monkeypatch, tmp_path):
+    """Final breadcrumbs sent on exit share a single time budget."""
+    import time
+
+    from migas import config
+    from migas import tracker as migas_tracker
+    from migas.spool import _claim
+
+    monkeypatch.setenv('MIGAS_EXIT_BUDGET_MS', '300')
+    monkeypatch.setenv('MIGAS_SPOOL', '1')
+    monkeypatch.setattr(config, '_get_config_dir', lambda: tmp_path)
+    mock_requests.request.side_effect = lambda *args, **kwargs: time.sleep(0.2)
+
+    trackers = [track(PROJ, f'0.0.{i}', signals=()) for i in range(3)]
+    try:
+        for t in trackers:
+            t._on_exit()
+    finally:
+        for t in trackers:
+            t._cleanup()
+
+    timeouts = [c[1]['timeout'] for c in mock_requests.request.call_args_list]
+    assert len(timeouts) == 2
+    assert 0.2 < timeouts[0] <= 0.3
+    assert timeouts[1] <= 0.1
+    # the last breadcrumb did not fit in the budget, and was spooled
+    assert migas_tracker._exit_stats['sent'] == 2
+    assert migas_tracker._exit_stats['deferred'] == 1
+    assert 0.4 <= migas_tracker._exit_stats['spent'] < 1
+    assert [p['project_version'] for _, p in _claim()] == ['0.0.2']
+
+
+def test_exit_start_ping_first(local_server, monkeypatch):
+    """On exit, the start ping still queued is sent before the final breadcrumb."""
+    import subprocess as sp
+    import sys
+    import time
+
+    monkeypatch.setenv('MIGAS_EXIT_BUDGET_MS', '3000')
+    local_server.latency = 0.3
+    code = (
+        'import migas; '
+        f'migas.setup(endpoint={local_server.url!r}); '
+        f"[migas.track({PROJ!r}, f'0.0.{{i}}') for i in range(3)]"
+    )
+    start = time.monotonic()
+    sp.run([sys.executable, '-c', code], check=True, timeout=30)
+    assert time.monotonic() - start < 6
+    statuses = {}
+    for c in local_server.breadcrumbs:
+        statuses.setdefault(c['project_version'], []).append(c['proc']['status'])
+    assert statuses == {f'0.0.{i}': ['R', 'C'] for i in range(3)}
+
+
+def _work(x):
+    return x
+
+
+def test_fork_workers(mock_requests):
+    """Forked workers report to the tracker that started them, which sends one summary."""
+    import multiprocessing as mp
+    import os
+
+    tracker = track(PROJ, VER, signals=())
+    try:
+        ctx = mp.get_context('fork')
+        with ctx.Pool(3) as pool:
+            assert pool.map(_work, range(3)) == [0, 1, 2]
+            pool.close()
+            pool.join()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                assert track(PROJ, VER) is tracker
+                tracker._on_exit()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+    finally:
+        tracker.stop()
+
+    assert mock_requests.request.call_count == 1
+    payload = mock_requests.request.call_args[1]['json_data']
+    assert payload['proc']['status'] == 'C'
+    assert payload['metrics']['workers'] == {'count': 4, 'status': {'C': 4}, 'error_type': {}}
+
+
+def test_resource_usage(mock_requests):
+    import subprocess as sp
+    import sys
+
+    with track(PROJ, VER, resources=True):
+        sum(i * i for i in range(200000))
+        sp.run([sys.executable, '-c', 'pass'], check=True)
+
+    metrics = mock_requests.request.call_args[1]['json_data']['metrics']
+    usage = metrics['resources']
+    assert set(usage) == {'wall', 'user', 'system', 'max_rss', 'workers'}
+    assert usage['wall'] > 0
+    assert usage['user'] + usage['system'] > 0
+    assert usage['max_rss'] > 1024
+    assert usage['workers'] == 0
+
+    # not collected by default
+    with track(PROJ, VER):
+        pass
+    assert 'metrics' not in mock_requests.request.call_args[1]['json_data']
+
+
+def test_tracker_spans(mock_requests):
+    import os
+
+    with track(PROJ, VER, signals=()) as tracker:
+        with tracker.span('setup'):
+            pass
+
+        @tracker.span('step')
+        def step():
+            pass
+
+        for _ in range(3):
+            step()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                step()
+                tracker._on_exit()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+    spans = mock_requests.request.call_args[1]['json_data']['metrics']['spans']
+    assert spans['setup']['count'] == 1
+    # including the forked worker
+    assert spans['step']['count'] == 4
+    assert 0 < spans['step']['max'] <= spans['step']['total']
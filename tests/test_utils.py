@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from migas import utils
+
+
+@pytest.fixture
+def host_cache(monkeypatch):
+    monkeypatch.setattr(utils, '_host_cache_key', lambda: 'boot:python:env')
+    return utils.get_runtime_dir() / utils.HOST_CACHE_FILE
+
+
+def test_runtime_dir(runtime_dir):
+    path = utils.get_runtime_dir()
+    assert path.parent == runtime_dir
+    assert path.is_dir()
+    assert path.stat().st_mode & 0o777 == 0o700
+
+
+def test_compile_info_cached(host_cache, monkeypatch):
+    info = utils.compile_info()
+    assert info['language'] == 'python'
+    cache = json.loads(host_cache.read_text())
+    assert cache == {'info': info, 'key': 'boot:python:env'}
+
+    # later calls do not probe the system
+    def fail():
+        raise AssertionError('probed')
+
+    monkeypatch.setattr(utils, 'is_container', fail)
+    assert utils.compile_info() == info
+
+    # unless the cache is no longer valid
+    monkeypatch.setattr(utils, '_host_cache_key', lambda: 'reboot:python:env')
+    with pytest.raises(AssertionError, match='probed'):
+        utils.compile_info()
+
+
+def test_host_cache_unavailable(host_cache, monkeypatch):
+    monkeypatch.setattr(utils, '_host_cache_key', lambda: None)
+    utils.update_host_cache(info={'a': 1})
+    assert utils.read_host_cache() == {}
+    assert not host_cache.exists()
+
+
+def test_host_cache_key(monkeypatch):
+    key = utils._host_cache_key()
+    if key is None:
+        pytest.skip('No boot id on this platform')
+    assert key == utils._host_cache_key()
+    monkeypatch.setenv('MIGAS_SOME_NEW_VARIABLE', '1')
+    assert key != utils._host_cache_key()